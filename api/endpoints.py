@@ -1,16 +1,16 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from fastapi.responses import JSONResponse
-import os
-import shutil
-from pathlib import Path
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from .models import *
+from .uploads import save_upload, run_ingestion
 from rag_chatbot import RAGChatbot
 from ollama_api import OllamaAPI
 from utils.filter_manager import FilterManager
 from utils.ResourceManager import ResourceManager
-from typing import List, Dict, Optional
+from utils import exporter
+from utils import metrics
+from utils.log_config import log_event
+from typing import List, Dict, Optional, Literal
 import logging
-import sqlite3
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,35 +25,11 @@ resource_manager = ResourceManager("./bdd/chatbot_metadata.db")
 def login(data: LoginRequest):
     user_info = filter_manager.authenticate(data.username, data.password)
     if user_info:
-        conn = sqlite3.connect("./bdd/chatbot_metadata.db")
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
         try:
-            cursor.execute("SELECT departement_id FROM filieres WHERE id = ?", (user_info["filiere_id"],))
-            departement_row = cursor.fetchone()
-            departement_id = departement_row["departement_id"] if departement_row else None
-
-            module_id = None
-            if user_info["filiere_id"]:
-                cursor.execute("SELECT id FROM modules WHERE filiere_id = ? LIMIT 1", (user_info["filiere_id"],))
-                module_row = cursor.fetchone()
-                module_id = module_row["id"] if module_row else None
-
-            activite_id = None
-            if module_id:
-                cursor.execute("SELECT id FROM activites WHERE module_id = ? LIMIT 1", (module_id,))
-                activite_row = cursor.fetchone()
-                activite_id = activite_row["id"] if activite_row else None
-
-            user_info.update({
-                "departement_id": departement_id,
-                "module_id": module_id,
-                "activite_id": activite_id
-            })
+            context = filter_manager.resolve_context(user_info["filiere_id"])
+            user_info.update(context)
         except Exception as e:
             logger.error(f"Error fetching context for user {user_info['user_id']}: {e}")
-        finally:
-            conn.close()
         
         return {"status": "success", "user_info": user_info}
     raise HTTPException(status_code=401, detail="Invalid username or password")
@@ -121,7 +97,8 @@ def get_users_by_filiere(filiere_id: int):
 
 @router.post("/chat", response_model=ChatResponse)
 def chat_with_context(data: ChatRequest):
-    logger.info(f"Received chat request: {data.dict()}")
+    log_event(logger, "chat.endpoint.request", user_id=data.user_id, profile_id=data.profile_id,
+              message_chars=len(data.message or ""))
     try:
         departement_id = data.departement_id
         filiere_id = data.filiere_id
@@ -131,28 +108,14 @@ def chat_with_context(data: ChatRequest):
         user_id = data.user_id
 
         if not all([departement_id, filiere_id, module_id, activite_id]) and user_id:
-            user = filter_manager.get_user_by_id(user_id)
+            user = filter_manager.get_cached_user(user_id)
             if user:
                 filiere_id = filiere_id or user.get("filiere_id")
-                conn = sqlite3.connect("./bdd/chatbot_metadata.db")
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                try:
-                    cursor.execute("SELECT departement_id FROM filieres WHERE id = ?", (filiere_id,))
-                    dep_row = cursor.fetchone()
-                    departement_id = departement_id or (dep_row["departement_id"] if dep_row else None)
-
-                    cursor.execute("SELECT id FROM modules WHERE filiere_id = ? LIMIT 1", (filiere_id,))
-                    mod_row = cursor.fetchone()
-                    module_id = module_id or (mod_row["id"] if mod_row else None)
-
-                    cursor.execute("SELECT id FROM activites WHERE module_id = ? LIMIT 1", (module_id,) if module_id else (0,))
-                    act_row = cursor.fetchone()
-                    activite_id = activite_id or (act_row["id"] if act_row else None)
-
-                    profile_id = profile_id or user.get("profile_id")
-                finally:
-                    conn.close()
+                context = filter_manager.resolve_context(filiere_id, departement_id, module_id, activite_id)
+                departement_id = context["departement_id"]
+                module_id = context["module_id"]
+                activite_id = context["activite_id"]
+                profile_id = profile_id or user.get("profile_id")
 
         if not all([profile_id, user_id]):
             raise HTTPException(status_code=400, detail="User ID and profile ID are required")
@@ -169,7 +132,7 @@ def chat_with_context(data: ChatRequest):
             profile_id=profile_id,
             user_id=user_id
         )
-        logger.info(f"Chat response generated: {response}")
+        log_event(logger, "chat.endpoint.response", user_id=user_id, response_chars=len(response or ""))
         return {"response": response}
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
@@ -178,21 +141,19 @@ def chat_with_context(data: ChatRequest):
 @router.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
     try:
-        upload_dir = Path("uploads")
-        upload_dir.mkdir(exist_ok=True)
-        
-        file_path = upload_dir / file.filename
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        upload = await save_upload(file)
         
         return {
             "status": "success", 
             "message": "File uploaded successfully",
-            "filename": file.filename,
-            "file_path": str(file_path)
+            "filename": upload["filename"],
+            "file_path": str(upload["file_path"]),
+            "size": upload["size"],
+            "sha256": upload["sha256"]
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading file: {str(e)}")
 
@@ -207,17 +168,12 @@ async def ingest_document_with_upload(
     user_id: int = Form(...)
 ):
     try:
-        upload_dir = Path("uploads")
-        upload_dir.mkdir(exist_ok=True)
+        upload = await save_upload(file)
         
-        file_path = upload_dir / file.filename
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        result = chatbot.ingestion_file(
-            base_filename=file.filename,
-            file_path=str(file_path),
+        result = await run_ingestion(
+            chatbot.ingestion_file,
+            base_filename=upload["filename"],
+            file_path=str(upload["file_path"]),
             departement_id=departement_id,
             filiere_id=filiere_id,
             module_id=module_id,
@@ -230,6 +186,8 @@ async def ingest_document_with_upload(
             return result
         raise HTTPException(status_code=400, detail=result["message"])
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
@@ -248,8 +206,79 @@ def get_statistics():
     return stats
 
 @router.get("/chat/history", response_model=List[ChatHistoryEntry])
-def get_chat_history_endpoint(profile_id: int, user_id: int, departement_id: Optional[int] = None, filiere_id: Optional[int] = None):
-    return filter_manager.get_chat_history(profile_id, user_id, departement_id, filiere_id)
+def get_chat_history_endpoint(
+    response: Response,
+    profile_id: int,
+    user_id: int,
+    departement_id: Optional[int] = None,
+    filiere_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    before_id: Optional[int] = None,
+    date_from: Optional[str] = Query(None, regex=r"^\d{4}-\d{2}-\d{2}$"),
+    date_to: Optional[str] = Query(None, regex=r"^\d{4}-\d{2}-\d{2}$")
+):
+    history = filter_manager.get_chat_history(
+        profile_id, user_id, departement_id, filiere_id,
+        limit=limit, before_id=before_id, date_from=date_from, date_to=date_to
+    )
+    # Cursor for the next page: pass it back as before_id
+    if len(history) == limit:
+        response.headers["X-Next-Before-Id"] = str(history[-1]["id"])
+    return history
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+
+def _export_response(rows, fields, export_format, name):
+    return StreamingResponse(
+        exporter.export_rows(rows, fields, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{export_format}"'}
+    )
+
+@router.get("/export/chat_history")
+def export_chat_history(
+    profile_id: int,
+    user_id: int,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    departement_id: Optional[int] = None,
+    filiere_id: Optional[int] = None,
+    module_id: Optional[int] = None,
+    date_from: Optional[str] = Query(None, regex=DATE_PATTERN),
+    date_to: Optional[str] = Query(None, regex=DATE_PATTERN)
+):
+    # Same visibility as /chat/history
+    scope = exporter.role_scope(profile_id, user_id, departement_id, filiere_id)
+    # Rows still queued by the write-behind writer
+    filter_manager.chat_history_writer.flush()
+    rows = iter(()) if scope is None else exporter.iter_chat_history(
+        filter_manager.db_path, filiere_id, module_id, date_from, date_to, scope=scope
+    )
+    return _export_response(rows, exporter.CHAT_HISTORY_FIELDS, format, "chat_history")
+
+@router.get("/export/documents")
+def export_documents(
+    profile_id: int,
+    user_id: int,
+    source: Literal["sqlite", "chroma"] = "sqlite",
+    format: Literal["ndjson", "csv"] = "ndjson",
+    departement_id: Optional[int] = None,
+    filiere_id: Optional[int] = None,
+    module_id: Optional[int] = None,
+    date_from: Optional[str] = Query(None, regex=DATE_PATTERN),
+    date_to: Optional[str] = Query(None, regex=DATE_PATTERN)
+):
+    scope = exporter.role_scope(profile_id, user_id, departement_id, filiere_id)
+    if source == "chroma":
+        # Chroma metadata has no ingestion date: date filters only apply to the SQLite export
+        rows = iter(()) if scope is None else exporter.iter_chroma_documents(
+            chatbot.collection, filiere_id, module_id, text_loader=filter_manager.get_chunk_texts, scope=scope
+        )
+        return _export_response(rows, exporter.CHROMA_FIELDS, format, "chroma_documents")
+    rows = iter(()) if scope is None else exporter.iter_document_metadata(
+        filter_manager.db_path, filiere_id, module_id, date_from, date_to, scope=scope
+    )
+    return _export_response(rows, exporter.DOCUMENT_METADATA_FIELDS, format, "document_metadata")
 
 @router.post("/summarize")
 def summarize_document(data: SummarizeRequest):
@@ -387,18 +416,33 @@ def delete_activite(id: int):
 @router.get("/debug/document/{file_hash}")
 def debug_document_info(file_hash: str):
     try:
-        results = chatbot.collection.get(where={"file_hash": file_hash})
+        chunk_count = chatbot.count_document_chunks(file_hash)
+        sample = chatbot.collection.get(where={"file_hash": file_hash}, limit=1, include=["metadatas", "documents"])
+        sample_document = sample['documents'][0] if sample['documents'] else None
+        if sample['ids'] and sample_document is None:
+            sample_document = filter_manager.get_chunk_texts(sample['ids'])[0]
         
         return {
             "file_hash": file_hash,
-            "exists_in_chromadb": len(results['ids']) > 0,
-            "chunk_count": len(results['ids']),
-            "sample_metadata": results['metadatas'][0] if results['metadatas'] else None,
-            "sample_document": results['documents'][0][:200] + "..." if results['documents'] else None
+            "exists_in_chromadb": chunk_count > 0,
+            "chunk_count": chunk_count,
+            "sqlite_chunk_count": filter_manager.get_document_chunk_count(file_hash),
+            "sample_metadata": sample['metadatas'][0] if sample['metadatas'] else None,
+            "sample_document": sample_document[:200] + "..." if sample_document else None
         }
     except Exception as e:
         return {"error": str(e)}
 
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus text exposition format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/debug/ingestion/pipeline")
+def debug_ingestion_pipeline():
+    """Per-stage ingestion throughput; blocked time points at the slower downstream stage"""
+    return chatbot.ingestion_pipeline.stats()
+
 @router.get("/debug/collection/stats")
 def debug_collection_stats():
     try:
@@ -418,10 +462,9 @@ def debug_collection_stats():
 @router.delete("/debug/document/{file_hash}")
 def debug_delete_document(file_hash: str):
     try:
-        results = chatbot.collection.get(where={"file_hash": file_hash})
-        if results['ids']:
-            chatbot.collection.delete(ids=results['ids'])
-            return {"message": f"Deleted {len(results['ids'])} chunks for hash {file_hash}"}
+        deleted = chatbot.delete_existing_document(file_hash)
+        if deleted:
+            return {"message": f"Deleted {deleted} chunks for hash {file_hash}"}
         else:
             return {"message": "No document found with that hash"}
     except Exception as e:
@@ -431,33 +474,38 @@ def debug_delete_document(file_hash: str):
 def delete_document_endpoint(file_hash: str):
     """Delete a document from both ChromaDB and SQLite metadata"""
     try:
-        # Delete from SQLite first
-        sqlite_result = filter_manager.delete_document_by_hash(file_hash)
-        
-        if sqlite_result["status"] == "error":
-            raise HTTPException(status_code=404, detail=sqlite_result["message"])
-        
-        # Delete from ChromaDB
-        try:
-            results = chatbot.collection.get(where={"file_hash": file_hash})
-            if results['ids']:
-                chatbot.collection.delete(ids=results['ids'])
-                chromadb_deleted = len(results['ids'])
-            else:
-                chromadb_deleted = 0
-        except Exception as e:
-            logger.warning(f"Error deleting from ChromaDB: {e}")
-            chromadb_deleted = 0
+        result = chatbot.delete_documents([file_hash])
+        sqlite_deleted = result["sqlite_deleted"][file_hash]
+        if sqlite_deleted == 0 and result["chromadb_deleted"] == 0:
+            raise HTTPException(status_code=404, detail="Document not found in database")
         
         return {
             "status": "success",
-            "message": f"Document deleted successfully. SQLite chunks: {sqlite_result['deleted_chunks']}, ChromaDB chunks: {chromadb_deleted}",
-            "sqlite_deleted": sqlite_result['deleted_chunks'],
-            "chromadb_deleted": chromadb_deleted
+            "message": f"Document deleted successfully. SQLite chunks: {sqlite_deleted}, ChromaDB chunks: {result['chromadb_deleted']}",
+            "sqlite_deleted": sqlite_deleted,
+            "chromadb_deleted": result["chromadb_deleted"]
         }
         
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error in delete document endpoint: {e}")
-        raise HTTPException(status_code=500, detail=f"Error deleting document: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error deleting document: {str(e)}")
+
+@router.post("/documents/delete")
+def delete_documents_endpoint(data: DeleteDocumentsRequest):
+    """Delete many documents at once from both ChromaDB and SQLite metadata"""
+    if not data.file_hashes:
+        raise HTTPException(status_code=400, detail="file_hashes must not be empty")
+    try:
+        result = chatbot.delete_documents(data.file_hashes)
+        return {
+            "status": "success",
+            "deleted_documents": sum(1 for count in result["sqlite_deleted"].values() if count),
+            "not_found": [file_hash for file_hash, count in result["sqlite_deleted"].items() if count == 0],
+            "sqlite_deleted": sum(result["sqlite_deleted"].values()),
+            "chromadb_deleted": result["chromadb_deleted"]
+        }
+    except Exception as e:
+        logger.error(f"Error in bulk delete documents endpoint: {e}")
+        raise HTTPException(status_code=500, detail=f"Error deleting documents: {str(e)}")
\ No newline at end of file
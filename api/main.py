@@ -1,6 +1,14 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from utils.log_config import configure_logging
+
+# Before the endpoints module is imported, so the chatbot's start-up logs go through the queue too
+configure_logging()
+
 from .endpoints import router
+from .uploads import UploadSizeLimitMiddleware
+from utils import chat_history_writer
+from utils import tracing
 
 app = FastAPI(title="EduLLM - Academic Assistant")
 
@@ -17,8 +25,26 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+# Rejects oversized uploads before their body is received and spooled
+app.add_middleware(UploadSizeLimitMiddleware)
+
 app.include_router(router)
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # Root span per request (sampled by TRACE_SAMPLE_RATE or an incoming traceparent)
+    if request.url.path == "/metrics":
+        return await call_next(request)
+    with tracing.span(f"{request.method} {request.url.path}", traceparent=request.headers.get("traceparent"), server=True,
+                      **{"http.method": request.method, "http.target": request.url.path}) as span:
+        response = await call_next(request)
+        span.set_attribute("http.status_code", response.status_code)
+        return response
+
+@app.on_event("shutdown")
+def flush_chat_history():
+    chat_history_writer.close_all()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -26,6 +26,7 @@ class ChatResponse(BaseModel):
          response: str
 
 class ChatHistoryEntry(BaseModel):
+         id: Optional[int] = None  # Curseur pour la pagination (before_id)
          user_id: int
          question: str
          answer: str
@@ -99,4 +100,7 @@ class UserResponse(BaseModel):
     profile_id: int
     filiere_id: Optional[int]
     annee_scolaire: Optional[str]
-    created_at: Optional[str] = None
\ No newline at end of file
+    created_at: Optional[str] = None
+
+class DeleteDocumentsRequest(BaseModel):
+    file_hashes: List[str]
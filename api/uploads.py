@@ -0,0 +1,106 @@
+import os
+import re
+import uuid
+import asyncio
+import hashlib
+import contextvars
+import logging
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = Path("uploads")
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "100")) * 1024 * 1024)
+# Room for the multipart boundaries and the other form fields around the file
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+READ_CHUNK_BYTES = 1024 * 1024
+
+# Parsing and embedding run here rather than on the event loop or in the shared
+# threadpool that serves the sync endpoints, so chat requests keep their workers.
+ingestion_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("INGEST_WORKERS", "2")), thread_name_prefix="ingest"
+)
+
+
+def safe_filename(filename: str) -> str:
+    """On-disk name for an upload: the last path component, never empty, "." or ".." """
+    name = re.split(r"[/\\]", filename or "")[-1].strip()
+    if name in ("", ".", "..") or "\0" in name:
+        raise HTTPException(status_code=400, detail="Invalid file name")
+    return name
+
+
+async def save_upload(file: UploadFile, upload_dir: Path = UPLOAD_DIR, max_bytes: int = MAX_UPLOAD_BYTES) -> dict:
+    """Stream an upload to disk in chunks, hashing it on the fly; 413 past max_bytes"""
+    upload_dir.mkdir(exist_ok=True)
+    # Only the path on disk is sanitized: the original name stays the document's base_filename,
+    # which (with the scope) identifies it across re-uploads
+    filename = safe_filename(file.filename)
+    file_path = upload_dir / filename
+    # Unique per upload: concurrent uploads of the same name must not share a partial file
+    partial_path = upload_dir / f".{filename}.{uuid.uuid4().hex}.part"
+    sha256 = hashlib.sha256()
+    size = 0
+    buffer = await run_in_threadpool(open, partial_path, "wb")
+    try:
+        while True:
+            chunk = await file.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail=f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+            sha256.update(chunk)
+            await run_in_threadpool(buffer.write, chunk)
+    except BaseException:
+        await run_in_threadpool(buffer.close)
+        partial_path.unlink(missing_ok=True)
+        raise
+    await run_in_threadpool(buffer.close)
+    os.replace(partial_path, file_path)
+    return {"filename": file.filename, "file_path": file_path, "sha256": sha256.hexdigest(), "size": size}
+
+
+class UploadSizeLimitMiddleware:
+    """413 for request bodies over max_bytes, before Starlette spools a multipart body
+    to disk: from Content-Length up front, otherwise (chunked bodies) as soon as the
+    bytes received exceed it. save_upload still enforces the per-file limit."""
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        detail = f"Request body exceeds the {self.max_bytes // (1024 * 1024)} MB limit"
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def run_ingestion(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # run_in_executor does not carry contextvars (the request's trace) over by itself
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(ingestion_executor, lambda: context.run(fn, *args, **kwargs))
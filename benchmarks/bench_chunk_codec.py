@@ -0,0 +1,65 @@
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import chunk_codec
+
+# Size vs. decode latency of the chunk_store codecs on the real corpus:
+#   python benchmarks/bench_chunk_codec.py --db-path ./bdd/chatbot_metadata.db
+# The dictionary is trained on 80% of the chunks and measured on the other 20%
+# so the ratio is not flattered by chunks the dictionary has already seen.
+
+parser = argparse.ArgumentParser(description="Benchmark chunk text compression codecs")
+parser.add_argument("--db-path", default="./bdd/chatbot_metadata.db")
+parser.add_argument("--dict-size", type=int, default=65536)
+parser.add_argument("--repeat", type=int, default=5)
+args = parser.parse_args()
+
+conn = sqlite3.connect(args.db_path)
+texts = [row[0] for row in conn.execute("SELECT chunk_text FROM document_metadata WHERE chunk_text IS NOT NULL")]
+if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunk_store'").fetchone():
+    reader = chunk_codec.ChunkCodec(args.db_path)
+    texts += [reader.decompress(row[0]) for row in conn.execute("SELECT data FROM chunk_store")]
+conn.close()
+texts = list(dict.fromkeys(texts))
+if len(texts) < 10:
+    sys.exit("Not enough chunks in the database to benchmark")
+
+split = int(len(texts) * 0.8)
+train, test = texts[:split], texts[split:]
+raw_bytes = sum(len(text.encode("utf-8")) for text in test)
+
+with tempfile.TemporaryDirectory() as tmp:
+    db_path = os.path.join(tmp, "codec.db")
+    # Only the dictionary table is needed by train_dictionary / ChunkCodec
+    sqlite3.connect(db_path).execute(
+        "CREATE TABLE compression_dicts (id INTEGER PRIMARY KEY AUTOINCREMENT, data BLOB, created_at TEXT)"
+    )
+    codecs = {"zlib-6": chunk_codec.ChunkCodec(method="zlib", level=6)}
+    if chunk_codec.zstandard is not None:
+        codecs["zstd-3"] = chunk_codec.ChunkCodec(method="zstd", level=3)
+        train_bytes = sum(len(text.encode("utf-8")) for text in train)
+        dict_size = min(args.dict_size, max(train_bytes // 10, 1024))
+        chunk_codec.train_dictionary(db_path, train, dict_size=dict_size)
+        codecs[f"zstd-3+dict({dict_size // 1024}K)"] = chunk_codec.ChunkCodec(db_path, method="zstd", level=3)
+    else:
+        print("zstandard not installed: zstd codecs skipped")
+
+    print(f"{len(test)} held-out chunks, {raw_bytes} bytes raw (trained on {len(train)})")
+    print(f"{'codec':<22}{'bytes':>10}{'ratio':>8}{'decode us/chunk':>18}")
+    for name, codec in codecs.items():
+        blobs = [codec.compress(text) for text in test]
+        size = sum(len(blob) for blob in blobs)
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for blob in blobs:
+                codec.decompress(blob)
+            timings.append((time.perf_counter() - start) / len(blobs) * 1e6)
+        print(f"{name:<22}{size:>10}{raw_bytes / size:>8.2f}{statistics.median(timings):>18.1f}")
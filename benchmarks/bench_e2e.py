@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from stub_ollama import start_stub_server
+from synthetic_corpus import generate_corpus
+
+# End-to-end benchmark: synthetic corpus -> /ingest, then /chat, /summarize,
+# /quiz and /stats under concurrent load, against the real API (uvicorn in a
+# subprocess, fresh SQLite/Chroma under a work directory) and a stub Ollama
+# with deterministic latency. Reports throughput, p50/p95/p99 and server memory:
+#   python benchmarks/bench_e2e.py --documents 50 --chunks-per-document 20 --requests 100 --concurrency 8
+#   python benchmarks/bench_e2e.py --documents 2000 --chunks-per-document 100 --output run.json --baseline main.json
+# With --baseline, exits 1 when a phase's p95 or throughput regresses by more
+# than --tolerance. Reuse an ingested corpus with --workdir DIR --skip-ingest.
+
+PHASES = ("chat", "summarize", "quiz", "stats")
+# Owner of the ingested corpus; retrieval filters on profile_id and user_id, so chats must use them too
+PROFILE_ID = 1
+USER_ID = 1
+
+
+def percentile(values, q):
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def server_memory(pid):
+    """Current and peak resident memory of the server process in MB (Linux /proc)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return {"rss_mb": int(fields["VmRSS"].split()[0]) / 1024, "peak_rss_mb": int(fields["VmHWM"].split()[0]) / 1024}
+    except (OSError, KeyError, ValueError):
+        return {"rss_mb": None, "peak_rss_mb": None}
+
+
+def run_load(name, requests_count, concurrency, make_request):
+    """Run make_request(i) requests_count times over `concurrency` threads; latency in ms"""
+    def one(i):
+        start = time.perf_counter()
+        try:
+            ok = make_request(i)
+        except requests.RequestException:
+            ok = False
+        return (time.perf_counter() - start) * 1000, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests_count)))
+    elapsed = time.perf_counter() - start
+    latencies = [latency for latency, ok in results if ok]
+    return {
+        "phase": name,
+        "requests": requests_count,
+        "errors": sum(1 for _, ok in results if not ok),
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else None,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def start_server(workdir, port, stub_url, log_path):
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, LLM_BACKEND="ollama", OLLAMA_URL=stub_url)
+    log = open(log_path, "ab")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    return process, log
+
+
+def wait_until_ready(base_url, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API server exited with code {process.returncode}")
+        try:
+            if requests.get(f"{base_url}/metrics", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(1)
+    raise RuntimeError(f"API server not ready after {timeout} s")
+
+
+def prepare_workdir(workdir):
+    os.makedirs(os.path.join(workdir, "bdd"), exist_ok=True)
+    os.makedirs(os.path.join(workdir, "uploads"), exist_ok=True)
+    # init_db.py uses paths relative to the working directory
+    subprocess.run([sys.executable, os.path.join(REPO_DIR, "init_db.py")], cwd=workdir, check=True,
+                   env=dict(os.environ, PYTHONPATH=REPO_DIR))
+
+
+def ingest(base_url, manifest, concurrency):
+    files = manifest["files"]
+
+    def upload(i):
+        entry = files[i]
+        with open(entry["path"], "rb") as f:
+            response = requests.post(f"{base_url}/ingest", files={"file": (os.path.basename(entry["path"]), f)}, data={
+                "departement_id": entry["departement_id"], "filiere_id": entry["filiere_id"],
+                "module_id": entry["module_id"], "activite_id": entry["activite_id"], "profile_id": PROFILE_ID, "user_id": USER_ID
+            }, timeout=3600)
+        return response.status_code == 200
+
+    return run_load("ingest", len(files), concurrency, upload)
+
+
+def compare(results, baseline, tolerance):
+    """Phases whose p95 or throughput regressed beyond the tolerance"""
+    previous = {phase["phase"]: phase for phase in baseline.get("phases", [])}
+    regressions = []
+    for phase in results["phases"]:
+        before = previous.get(phase["phase"])
+        if not before:
+            continue
+        if before.get("p95_ms") and phase["p95_ms"] and phase["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{phase['phase']}: p95 {before['p95_ms']:.1f} -> {phase['p95_ms']:.1f} ms")
+        if before.get("throughput") and phase["throughput"] is not None \
+                and phase["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(f"{phase['phase']}: throughput {before['throughput']:.2f} -> {phase['throughput']:.2f} req/s")
+    return regressions
+
+
+def print_report(results):
+    corpus = results["corpus"]
+    print(f"\n{corpus['documents']} documents, {corpus['chunks']} chunks; stub LLM {results['llm']['first_token_ms']} ms "
+          f"+ {results['llm']['token_ms']} ms/token; concurrency {results['concurrency']}")
+    print(f"{'phase':<11}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rss MB':>9}{'peak MB':>9}")
+    for phase in results["phases"]:
+        def fmt(value, spec):
+            return format(value, spec) if value is not None else "-"
+        print(f"{phase['phase']:<11}{phase['requests']:>9}{phase['errors']:>8}{fmt(phase['throughput'], '>9.2f')}"
+              f"{fmt(phase['p50_ms'], '>10.1f')}{fmt(phase['p95_ms'], '>10.1f')}{fmt(phase['p99_ms'], '>10.1f')}"
+              f"{fmt(phase['rss_mb'], '>9.0f')}{fmt(phase['peak_rss_mb'], '>9.0f')}")
+    if results.get("ingest_chunks_per_second"):
+        print(f"ingestion: {results['ingest_chunks_per_second']:.1f} chunks/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end API benchmark with a stub LLM and a synthetic corpus")
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--chunks-per-document", type=int, default=20)
+    parser.add_argument("--scopes", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=100, help="Requests per phase")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ingest-concurrency", type=int, default=2)
+    parser.add_argument("--phases", nargs="+", choices=PHASES, default=list(PHASES))
+    parser.add_argument("--first-token-ms", type=float, default=150)
+    parser.add_argument("--token-ms", type=float, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workdir", help="Keep databases here (default: a temporary directory)")
+    parser.add_argument("--skip-ingest", action="store_true", help="Reuse the corpus already ingested in --workdir")
+    parser.add_argument("--startup-timeout", type=float, default=600, help="Embedding model download/load included")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Results JSON of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="edullm_bench_")
+    stub = start_stub_server(0, args.first_token_ms, args.token_ms)
+    stub_url = f"http://127.0.0.1:{stub.server_address[1]}"
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    corpus_dir = os.path.join(workdir, "corpus")
+    if args.skip_ingest:
+        with open(os.path.join(corpus_dir, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+    else:
+        prepare_workdir(workdir)
+        manifest = generate_corpus(corpus_dir, args.documents, args.chunks_per_document, args.scopes, args.seed)
+
+    process, log = start_server(workdir, args.port, stub_url, os.path.join(workdir, "server.log"))
+    results = {"corpus": {"documents": len(manifest["files"]), "chunks": None}, "concurrency": args.concurrency,
+               "llm": {"first_token_ms": args.first_token_ms, "token_ms": args.token_ms}, "phases": []}
+    try:
+        wait_until_ready(base_url, process, args.startup_timeout)
+        print(f"API ready (work directory {workdir})")
+
+        if not args.skip_ingest:
+            phase = ingest(base_url, manifest, args.ingest_concurrency)
+            phase.update(server_memory(process.pid))
+            results["phases"].append(phase)
+
+        documents = requests.get(f"{base_url}/ingested", timeout=60).json()
+        hashes = [document["file_hash"] for document in documents]
+        results["corpus"]["chunks"] = sum(document.get("nb_chunks") or 0 for document in documents)
+        if not args.skip_ingest and results["phases"][0]["seconds"]:
+            results["ingest_chunks_per_second"] = results["corpus"]["chunks"] / results["phases"][0]["seconds"]
+        if not hashes:
+            raise RuntimeError("No documents were ingested, see server.log")
+
+        files = manifest["files"]
+        questions = {}
+        for question in manifest["questions"]:
+            questions.setdefault(question["topic"], []).append(question["question"])
+
+        # One generator per request index, so the request mix does not depend on thread scheduling
+        def chat(i):
+            rng = random.Random(args.seed * 1000003 + i)
+            entry = files[rng.randrange(len(files))]
+            return requests.post(f"{base_url}/chat", json={
+                "message": rng.choice(questions[entry["topic"]]),
+                "departement_id": entry["departement_id"], "filiere_id": entry["filiere_id"],
+                "module_id": entry["module_id"], "activite_id": entry["activite_id"],
+                "profile_id": PROFILE_ID, "user_id": USER_ID
+            }, timeout=300).status_code == 200
+
+        def summarize(i):
+            rng = random.Random(args.seed * 1000003 + i)
+            return requests.post(f"{base_url}/summarize", json={
+                "file_hashes": rng.sample(hashes, min(2, len(hashes))),
+                "level": "simplified" if i % 2 else "detailed"
+            }, timeout=300).status_code == 200
+
+        def quiz(i):
+            rng = random.Random(args.seed * 1000003 + i)
+            return requests.post(f"{base_url}/quiz", json={"file_hashes": [rng.choice(hashes)], "num_questions": 5},
+                                 timeout=300).status_code == 200
+
+        def stats(i):
+            return requests.get(f"{base_url}/stats", timeout=60).status_code == 200
+
+        load = {"chat": chat, "summarize": summarize, "quiz": quiz, "stats": stats}
+        for name in args.phases:
+            phase = run_load(name, args.requests, args.concurrency, load[name])
+            phase.update(server_memory(process.pid))
+            results["phases"].append(phase)
+    finally:
+        # SIGINT lets uvicorn run the shutdown handlers (chat history flush)
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+        stub.shutdown()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db_schema import SCHEMA_STATEMENTS
+
+# Document existence / chunk count lookups on a synthetic collection with
+# documents of thousands of chunks:
+#   python benchmarks/bench_existence_check.py --documents 5 --chunks 3000
+# Compares the former collection.get(where=...) (documents, metadatas and ids),
+# the ids-only / limit=1 Chroma queries and the documents summary table.
+
+parser = argparse.ArgumentParser(description="Benchmark document existence checks")
+parser.add_argument("--documents", type=int, default=5)
+parser.add_argument("--chunks", type=int, default=3000, help="Chunks per document")
+parser.add_argument("--chunk-chars", type=int, default=1000)
+parser.add_argument("--dim", type=int, default=384)
+parser.add_argument("--repeat", type=int, default=20)
+args = parser.parse_args()
+
+
+def timed(label, fn):
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<42}{statistics.median(timings):>10.2f} ms   -> {result}")
+
+
+rng = np.random.default_rng(0)
+text = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 40)[:args.chunk_chars]
+
+with tempfile.TemporaryDirectory() as tmp:
+    collection = chromadb.PersistentClient(path=os.path.join(tmp, "chroma")).get_or_create_collection(name="documents")
+    conn = sqlite3.connect(os.path.join(tmp, "metadata.db"))
+    conn.execute(next(statement for statement in SCHEMA_STATEMENTS if "TABLE IF NOT EXISTS documents" in statement))
+
+    for d in range(args.documents):
+        file_hash = f"{d:064x}"
+        for start in range(0, args.chunks, 1000):
+            indexes = range(start, min(start + 1000, args.chunks))
+            collection.add(
+                ids=[f"{file_hash}_{i}" for i in indexes],
+                embeddings=rng.standard_normal((len(indexes), args.dim)).astype(np.float32).tolist(),
+                documents=[text] * len(indexes),
+                metadatas=[{"file_hash": file_hash, "chunk_index": i} for i in indexes]
+            )
+        conn.execute("INSERT INTO documents (file_hash, chunk_count) VALUES (?, ?)", (file_hash, args.chunks))
+    conn.commit()
+
+    target = f"{args.documents - 1:064x}"
+    print(f"{args.documents} documents x {args.chunks} chunks of {args.chunk_chars} chars, median of {args.repeat}")
+    timed("chroma get(where) [previous]", lambda: len(collection.get(where={"file_hash": target})["ids"]) > 0)
+    timed("chroma get(where, limit=1, include=[])",
+          lambda: len(collection.get(where={"file_hash": target}, limit=1, include=[])["ids"]) > 0)
+    timed("chroma get(where, include=[]) count", lambda: len(collection.get(where={"file_hash": target}, include=[])["ids"]))
+    timed("sqlite documents lookup",
+          lambda: conn.execute("SELECT chunk_count FROM documents WHERE file_hash = ?", (target,)).fetchone()[0])
+    conn.close()
@@ -0,0 +1,89 @@
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import log_config
+from utils.log_config import log_event, log_payload, payload_sampled
+
+# Logging cost per chat request, as seen by the request thread, writing to a
+# log file:
+#   python benchmarks/bench_logging.py --context-chars 200000 --response-chars 20000
+# "before" replays the former INFO logs (request dict, retrieved context, full
+# prompt, full response) through a synchronous handler; "after" the structured,
+# size-capped events through the queue handler, payloads unsampled.
+
+parser = argparse.ArgumentParser(description="Benchmark request logging overhead")
+parser.add_argument("--context-chars", type=int, default=200000, help="Retrieved context size (a long summary)")
+parser.add_argument("--response-chars", type=int, default=20000)
+parser.add_argument("--requests", type=int, default=200)
+parser.add_argument("--format", choices=["text", "json"], default="text")
+args = parser.parse_args()
+
+logger = logging.getLogger("rag_chatbot")
+context = [("Chapitre sur les bases de données relationnelles. " * 20)[:1000]] * (args.context_chars // 1000)
+prompt = f"Contexte : {' '.join(context)}\n\nQuestion : Qu'est-ce qu'une clé étrangère ?\nRéponse :"
+response = ("Une clé étrangère référence la clé primaire d'une autre table. " * 400)[:args.response_chars]
+request = {"message": "Qu'est-ce qu'une clé étrangère ?", "departement_id": 1, "filiere_id": 2, "module_id": 3,
+           "activite_id": 4, "profile_id": 2, "user_id": 5}
+
+
+def before():
+    logger.info(f"Received chat request: {request}")
+    logger.info(f"Generating response for query: {request['message']}, filters: 1, 2, 3, 4, 2, 5")
+    logger.info(f"Retrieved context: {context}")
+    logger.info(f"Sending prompt to Ollama: {prompt}")
+    logger.info(f"Ollama response: {response}")
+    logger.info(f"Chat response generated: {response}")
+
+
+def after():
+    log_event(logger, "chat.endpoint.request", user_id=5, profile_id=2, message_chars=len(request["message"]))
+    sampled = payload_sampled(logger)
+    log_event(logger, "chat.request", user_id=5, departement_id=1, filiere_id=2, module_id=3, activite_id=4,
+              profile_id=2, query=request["message"])
+    log_event(logger, "chat.context", chunks=len(context), chars=sum(len(chunk) for chunk in context))
+    log_payload(logger, "chat.context", sampled, context=context)
+    log_payload(logger, "chat.prompt", sampled, prompt=prompt)
+    log_event(logger, "chat.response", prompt_chars=len(prompt), response_chars=len(response))
+    log_payload(logger, "chat.response", sampled, response=response)
+    log_event(logger, "chat.endpoint.response", user_id=5, response_chars=len(response))
+
+
+def measure(fn):
+    timings = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    before_path = os.path.join(tmp, "before.log")
+    with open(before_path, "w", encoding="utf-8") as stream:
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        root.addHandler(handler)
+        before_timings = measure(before)
+        root.removeHandler(handler)
+
+    after_path = os.path.join(tmp, "after.log")
+    with open(after_path, "w", encoding="utf-8") as stream:
+        log_config.configure_logging("INFO", args.format, stream=stream)
+        after_timings = measure(after)
+        log_config.stop_logging()
+
+    print(f"{args.requests} requests, context {args.context_chars} chars, response {args.response_chars} chars")
+    for label, (median, p99), path in (("before (sync, full payloads)", before_timings, before_path),
+                                       (f"after (queue, {args.format}, capped)", after_timings, after_path)):
+        size = os.path.getsize(path) / args.requests / 1024
+        print(f"{label:<34}median {median:>8.3f} ms   p99 {p99:>8.3f} ms   {size:>8.1f} KB logged/request")
@@ -0,0 +1,59 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+import PyPDF2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import pdf_extract
+
+# Sequential vs. worker-process page extraction over the PDFs in uploads/:
+#   python benchmarks/bench_pdf_extraction.py --workers 2 4
+# Worker start-up is part of every parallel read and is counted; the parallel
+# text is checked against the sequential one (same text => same file hash).
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel PDF text extraction")
+    parser.add_argument("--pattern", default="./uploads/*.pdf")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(args.pattern))
+    if not files:
+        sys.exit(f"No PDF matches {args.pattern}")
+
+    columns = ["sequential"] + [f"{workers} procs" for workers in args.workers]
+    print(f"{'file':<46}{'pages':>6}" + "".join(f"{column + ' s':>15}" for column in columns))
+    totals = [0.0] * len(columns)
+    for path in files:
+        pages = len(PyPDF2.PdfReader(path).pages)
+        sequential, text = best_of(lambda: pdf_extract.read_pdf(path, workers=1), args.repeat)
+        row = [sequential]
+        for workers in args.workers:
+            elapsed, parallel_text = best_of(
+                lambda: pdf_extract.read_pdf(path, workers=workers, min_pages=1), args.repeat
+            )
+            if parallel_text != text:
+                print(f"  text differs from the sequential read with {workers} workers: {path}")
+            row.append(elapsed)
+        totals = [total + value for total, value in zip(totals, row)]
+        print(f"{os.path.basename(path)[:44]:<46}{pages:>6}" + "".join(f"{value:>15.3f}" for value in row))
+    print(f"{'total':<52}" + "".join(f"{value:>15.3f}" for value in totals))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from rag_chatbot import RAGChatbot
+from utils.file_processor import FileProcessor
+from utils.reranker import CrossEncoderReranker
+
+# Retrieval quality and latency of several configurations side by side, on a
+# labeled query set:
+#   python benchmarks/eval_retrieval.py labels.json --chunk-sizes 850 500 --overlaps 130 \
+#       --clean 1 0 --top-k 3 5 --thresholds 0.45 0.3 --rerank none cross-encoder/mmarco-mMiniLMv2-L12-H384-v1
+#
+# labels.json (document paths relative to the file; scope ids default to "scope"):
+#   {"scope": {"departement_id": 1, "filiere_id": 1, "module_id": 1, "activite_id": 1, "profile_id": 1, "user_id": 1},
+#    "documents": [{"path": "docs/bdd.pdf"}, {"path": "docs/reseaux.docx", "module_id": 2}],
+#    "queries": [{"id": "q1", "query": "Qu'est-ce qu'une clé étrangère ?",
+#                 "relevant": ["une clé étrangère référence la clé primaire d'une autre table"]}]}
+#
+# Relevant chunks are given as text spans of the source documents rather than
+# chunk ids, so labels survive changes to chunking and cleaning. A retrieved
+# chunk is relevant when it contains a span (both go through the same cleaning),
+# or at least half of it at its start or end, for spans cut by a chunk boundary.
+# Every (chunk size, overlap, cleaning) gets its own fresh index; top_k,
+# threshold and re-ranking are then varied on it through find_relevant_context.
+#
+# Per configuration: recall@k (fraction of the spans covered by the chunks
+# returned, i.e. sent to the LLM), hit rate (at least one span), MRR, chunks
+# and characters returned per query, and p50/p95 query latency.
+
+SCOPE_FIELDS = ("departement_id", "filiere_id", "module_id", "activite_id", "profile_id", "user_id")
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def span_matches(chunk: str, span: str) -> bool:
+    if span in chunk:
+        return True
+    # Span split by a chunk boundary: the chunk ends with its beginning or starts with its end
+    # (at least half of the span and 20 characters, so short spans must match whole)
+    for size in range(len(span) - 1, max(len(span) // 2, 20) - 1, -1):
+        if chunk.endswith(span[:size]) or chunk.startswith(span[-size:]):
+            return True
+    return False
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def load_labels(path):
+    with open(path, encoding="utf-8") as f:
+        labels = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    default_scope = labels.get("scope", {})
+    for item in labels["documents"] + labels["queries"]:
+        for field in SCOPE_FIELDS:
+            item.setdefault(field, default_scope.get(field))
+    for document in labels["documents"]:
+        document["path"] = os.path.join(base, document["path"])
+    for i, query in enumerate(labels["queries"]):
+        query.setdefault("id", f"q{i + 1}")
+    return labels
+
+
+def build_index(workdir, labels, chunk_size, overlap, clean, embedding_cache_path):
+    os.makedirs(os.path.join(workdir, "bdd"), exist_ok=True)
+    # init_db.py creates the tables relative to its working directory
+    subprocess.run([sys.executable, os.path.join(REPO_DIR, "init_db.py")], cwd=workdir, check=True,
+                   env=dict(os.environ, PYTHONPATH=REPO_DIR))
+    chatbot = RAGChatbot(
+        ollama_api=None, db_path=os.path.join(workdir, "chroma"), vector_store_path=os.path.join(workdir, "vector_store"),
+        scope_index_path=os.path.join(workdir, "scope_index"), embedding_cache_path=embedding_cache_path,
+        metadata_db_path=os.path.join(workdir, "bdd", "chatbot_metadata.db")
+    )
+    chatbot.file_processor = FileProcessor(chunk_size=chunk_size, chunk_overlap=overlap, clean=clean)
+    chatbot.reranker = None
+    start = time.perf_counter()
+    results = chatbot.ingest_files([
+        {"base_filename": os.path.basename(document["path"]), "file_path": document["path"],
+         **{field: document[field] for field in SCOPE_FIELDS}}
+        for document in labels["documents"]
+    ])
+    for document, result in zip(labels["documents"], results):
+        if result.get("status") != "success":
+            print(f"  ingestion failed for {document['path']}: {result.get('message')}")
+    return chatbot, time.perf_counter() - start
+
+
+def evaluate(chatbot, queries, spans, top_k, threshold, fetch_k, budget_ms):
+    rows = []
+    for query in queries:
+        scope = [query[field] for field in SCOPE_FIELDS]
+        start = time.perf_counter()
+        chunks = chatbot.find_relevant_context(query["query"], *scope, top_k=top_k, similarity_threshold=threshold,
+                                               fetch_k=fetch_k, latency_budget_ms=budget_ms) or []
+        latency = (time.perf_counter() - start) * 1000
+        normalized = [normalize(chunk) for chunk in chunks]
+        query_spans = spans[query["id"]]
+        covered = [span for span in query_spans if any(span_matches(chunk, span) for chunk in normalized)]
+        first = next((rank for rank, chunk in enumerate(normalized, 1)
+                      if any(span_matches(chunk, span) for span in query_spans)), None)
+        rows.append({
+            "query_id": query["id"],
+            "recall": len(covered) / len(query_spans) if query_spans else 0.0,
+            "hit": bool(covered),
+            "reciprocal_rank": 1 / first if first else 0.0,
+            "first_relevant_rank": first,
+            "chunks": len(chunks),
+            "chars": sum(len(chunk) for chunk in chunks),
+            "latency_ms": latency
+        })
+    return rows
+
+
+def summarize(config, rows):
+    latencies = [row["latency_ms"] for row in rows]
+    return {
+        **config,
+        "queries": len(rows),
+        "recall_at_k": statistics.mean(row["recall"] for row in rows),
+        "hit_rate": statistics.mean(row["hit"] for row in rows),
+        "mrr": statistics.mean(row["reciprocal_rank"] for row in rows),
+        "chunks_per_query": statistics.mean(row["chunks"] for row in rows),
+        "chars_per_query": statistics.mean(row["chars"] for row in rows),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95)
+    }
+
+
+def print_table(summaries):
+    print(f"\n{'chunk':>6}{'overlap':>8}{'clean':>6}{'top_k':>6}{'thresh':>7}  {'rerank':<12}"
+          f"{'recall@k':>9}{'hit':>7}{'MRR':>7}{'chunks':>8}{'chars':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for s in summaries:
+        rerank = (s["rerank"] or "none").split("/")[-1][:11]
+        print(f"{s['chunk_size']:>6}{s['chunk_overlap']:>8}{'yes' if s['clean'] else 'no':>6}{s['top_k']:>6}"
+              f"{s['similarity_threshold']:>7.2f}  {rerank:<12}{s['recall_at_k']:>9.3f}{s['hit_rate']:>7.3f}"
+              f"{s['mrr']:>7.3f}{s['chunks_per_query']:>8.2f}{s['chars_per_query']:>8.0f}"
+              f"{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval configurations on a labeled query set")
+    parser.add_argument("labels", help="Labeled query set (JSON, see the header of this script)")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[850])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[130])
+    parser.add_argument("--clean", type=int, nargs="+", choices=[0, 1], default=[1], help="TextPipeline cleaning on/off")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[3])
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.45])
+    parser.add_argument("--rerank", nargs="+", default=["none"], help="'none' and/or cross-encoder model names")
+    parser.add_argument("--fetch-k", type=int, default=30, help="Candidates re-ranked")
+    parser.add_argument("--rerank-budget-ms", type=float, default=60000,
+                        help="Latency budget passed to find_relevant_context (high: always re-rank)")
+    parser.add_argument("--workdir", help="Keep the indexes here (default: a temporary directory)")
+    parser.add_argument("--output", help="Write the summaries as JSON")
+    parser.add_argument("--details", help="Write per-query results (recall, rank, latency) per configuration as CSV")
+    args = parser.parse_args()
+
+    labels = load_labels(args.labels)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="edullm_eval_")
+    embedding_cache_path = os.path.join(workdir, "embedding_cache.db")
+    rerankers = {}
+    summaries, details = [], []
+
+    for n, (chunk_size, overlap, clean) in enumerate(itertools.product(args.chunk_sizes, args.overlaps, args.clean)):
+        if overlap >= chunk_size:
+            continue
+        print(f"Indexing with chunk_size={chunk_size} overlap={overlap} clean={bool(clean)}")
+        chatbot, seconds = build_index(os.path.join(workdir, f"index_{n}"), labels, chunk_size, overlap, bool(clean),
+                                       embedding_cache_path)
+        print(f"  {chatbot.collection.count()} chunks in {seconds:.1f} s")
+        # The label spans go through the same cleaning as the documents
+        spans = {query["id"]: [span for span in (normalize(chatbot.file_processor.clean_text(text))
+                                                 for text in query["relevant"]) if span]
+                 for query in labels["queries"]}
+        # Warm up the query encoder so the first configuration is not charged for it
+        chatbot.encode([labels["queries"][0]["query"]])
+
+        for top_k, threshold, rerank in itertools.product(args.top_k, args.thresholds, args.rerank):
+            model = None if rerank == "none" else rerank
+            if model and model not in rerankers:
+                rerankers[model] = CrossEncoderReranker(model)
+            chatbot.reranker = rerankers.get(model)
+            config = {"chunk_size": chunk_size, "chunk_overlap": overlap, "clean": bool(clean),
+                      "top_k": top_k, "similarity_threshold": threshold, "rerank": model}
+            rows = evaluate(chatbot, labels["queries"], spans, top_k, threshold, args.fetch_k, args.rerank_budget_ms)
+            summaries.append(summarize(config, rows))
+            details.extend({**config, **row} for row in rows)
+        del chatbot
+
+    print_table(summaries)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, indent=2, ensure_ascii=False)
+    if args.details and details:
+        with open(args.details, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(details[0]))
+            writer.writeheader()
+            writer.writerows(details)
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stand-in for a local Ollama server: POST /api/generate streams a canned answer
+# as NDJSON with deterministic latency (a fixed time to first token, then a
+# fixed delay per token), so end-to-end numbers measure the application and
+# not the model. Quiz prompts ("EXACTEMENT <n> questions QCM") get n valid
+# questions back. Point the app at it with LLM_BACKEND=ollama and OLLAMA_URL:
+#   python benchmarks/stub_ollama.py --port 11500 --first-token-ms 150 --token-ms 5
+
+ANSWER = ("Une clé primaire identifie de manière unique chaque ligne d'une table ; "
+          "elle ne peut pas être nulle et sert de référence aux clés étrangères. ")
+
+
+def quiz_answer(count: int) -> str:
+    levels = ["knowledge", "comprehension", "application"]
+    return json.dumps({"questions": [
+        {"question": f"Question {i + 1} : quel énoncé décrit correctement la notion étudiée ?",
+         "options": ["Première proposition", "Deuxième proposition", "Troisième proposition", "Quatrième proposition"],
+         "correct_answer": i % 4, "bloom_level": levels[i % 3]}
+        for i in range(count)
+    ]}, ensure_ascii=False)
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    first_token_seconds = 0.15
+    token_seconds = 0.005
+    answer_tokens = 60
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = body.get("prompt", "")
+        match = re.search(r"EXACTEMENT (\d+) questions", prompt)
+        if match:
+            tokens = [quiz_answer(int(match.group(1)))]
+        else:
+            words = (ANSWER * (self.answer_tokens // len(ANSWER.split()) + 1)).split()[:self.answer_tokens]
+            tokens = [f"{word} " for word in words]
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        start = time.perf_counter()
+        time.sleep(self.first_token_seconds)
+        for token in tokens:
+            self._write_line({"model": body.get("model"), "response": token, "done": False})
+            time.sleep(self.token_seconds)
+        self._write_line({"model": body.get("model"), "response": "", "done": True, "eval_count": len(tokens),
+                          "eval_duration": int((time.perf_counter() - start) * 1e9), "prompt_eval_count": len(prompt) // 4})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_line(self, data: dict):
+        line = json.dumps(data, ensure_ascii=False).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+
+def start_stub_server(port: int = 0, first_token_ms: float = 150, token_ms: float = 5, answer_tokens: int = 60):
+    """Serve in a daemon thread; returns the server (server.server_address[1] is the port)"""
+    handler = type("ConfiguredStubOllamaHandler", (StubOllamaHandler,), {
+        "first_token_seconds": first_token_ms / 1000,
+        "token_seconds": token_ms / 1000,
+        "answer_tokens": answer_tokens
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-ollama", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub Ollama server with deterministic latency")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--first-token-ms", type=float, default=150)
+    parser.add_argument("--token-ms", type=float, default=5)
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    args = parser.parse_args()
+    server = start_stub_server(args.port, args.first_token_ms, args.token_ms, args.answer_tokens)
+    print(f"Stub Ollama listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
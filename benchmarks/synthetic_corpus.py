@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import random
+
+# Deterministic synthetic course corpus (French, English, Arabic) laid out as
+# <departement>/<filiere>/<module>/<activite>/<course>.txt, the layout read by
+# watch_folder.py. Size is given in chunks (FileProcessor's default 850
+# characters, 130 overlapping), so runs scale from hundreds to hundreds of
+# thousands of chunks:
+#   python benchmarks/synthetic_corpus.py ./bench_corpus --documents 200 --chunks-per-document 50
+# A manifest.json lists every file with its scope ids and topic, and one
+# question per topic for the chat load.
+
+# Characters per chunk once the overlap is accounted for
+CHUNK_STEP = 850 - 130
+
+TOPICS = {
+    "fr": [
+        ("bases de données", ["clé primaire", "clé étrangère", "normalisation", "jointure", "index", "transaction"]),
+        ("réseaux", ["adresse IP", "routage", "protocole TCP", "commutateur", "sous-réseau", "pare-feu"]),
+        ("algorithmique", ["complexité", "tri rapide", "récursivité", "graphe", "programmation dynamique", "pile"]),
+        ("comptabilité", ["bilan", "compte de résultat", "amortissement", "trésorerie", "actif", "passif"]),
+    ],
+    "en": [
+        ("operating systems", ["process", "scheduler", "virtual memory", "deadlock", "file system", "semaphore"]),
+        ("machine learning", ["gradient descent", "overfitting", "cross-validation", "feature", "loss function", "regularization"]),
+        ("marketing", ["segmentation", "positioning", "brand equity", "pricing", "distribution", "customer journey"]),
+    ],
+    "ar": [
+        ("قواعد البيانات", ["المفتاح الأساسي", "الجدول", "الاستعلام", "الفهرس", "المعاملة", "العلاقة"]),
+        ("الاقتصاد", ["العرض", "الطلب", "التضخم", "الناتج المحلي", "السوق", "الاستثمار"]),
+    ],
+}
+
+TEMPLATES = {
+    "fr": [
+        "Dans le cours de {topic}, la notion de {term} est définie comme un élément central du programme.",
+        "L'étudiant doit comprendre comment {term} intervient dans les exercices pratiques de {topic}.",
+        "Un exemple classique de {term} permet d'illustrer les principes fondamentaux de {topic}.",
+        "Il est recommandé de réviser {term} avant l'évaluation finale du module de {topic}.",
+        "La relation entre {term} et {other} est souvent source d'erreurs lors des travaux dirigés.",
+    ],
+    "en": [
+        "In the {topic} course, {term} is introduced as a core concept of the syllabus.",
+        "Students should be able to explain how {term} relates to {other} in practical exercises.",
+        "A classic example of {term} illustrates the fundamental principles of {topic}.",
+        "Reviewing {term} before the final {topic} exam is strongly recommended.",
+        "The lab session applies {term} to a realistic {topic} case study.",
+    ],
+    "ar": [
+        "في مقرر {topic} يعتبر {term} من المفاهيم الأساسية في البرنامج.",
+        "يجب على الطالب أن يفهم العلاقة بين {term} و {other} في التمارين التطبيقية.",
+        "يوضح مثال {term} المبادئ الأساسية في {topic}.",
+        "ينصح بمراجعة {term} قبل الامتحان النهائي لمادة {topic}.",
+    ],
+}
+
+QUESTIONS = {
+    "fr": "Qu'est-ce que {term} en {topic} ?",
+    "en": "What is {term} in {topic}?",
+    "ar": "ما هو {term} في {topic}؟",
+}
+
+
+def _document_text(rng: random.Random, language: str, topic: str, terms: list, chars: int) -> str:
+    sentences = []
+    size = 0
+    while size < chars:
+        term, other = rng.sample(terms, 2)
+        sentence = rng.choice(TEMPLATES[language]).format(topic=topic, term=term, other=other)
+        sentences.append(sentence)
+        size += len(sentence) + 1
+        if rng.random() < 0.15:
+            sentences.append("\n\n")
+    return " ".join(sentences)
+
+
+def generate_corpus(root: str, documents: int = 100, chunks_per_document: int = 20, scopes: int = 4,
+                    seed: int = 0) -> dict:
+    """Write the corpus under root and return its manifest"""
+    rng = random.Random(seed)
+    catalog = [(language, topic, terms) for language, topics in TOPICS.items() for topic, terms in topics]
+    files = []
+    for d in range(documents):
+        language, topic, terms = catalog[d % len(catalog)]
+        # Scope ids start at 1; every scope gets documents of several topics
+        scope = d % scopes + 1
+        scope_ids = {"departement_id": scope, "filiere_id": scope, "module_id": scope, "activite_id": scope}
+        directory = os.path.join(root, *(str(scope_ids[key]) for key in
+                                         ("departement_id", "filiere_id", "module_id", "activite_id")))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"course_{d:06d}_{language}.txt")
+        text = _document_text(rng, language, topic, terms, chunks_per_document * CHUNK_STEP)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        files.append({"path": path, "language": language, "topic": topic, **scope_ids})
+
+    questions = [
+        {"language": language, "topic": topic, "term": term,
+         "question": QUESTIONS[language].format(term=term, topic=topic)}
+        for language, topic, terms in catalog for term in terms
+    ]
+    manifest = {"documents": documents, "chunks_per_document": chunks_per_document, "scopes": scopes,
+                "seed": seed, "files": files, "questions": questions}
+    with open(os.path.join(root, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic multilingual course corpus")
+    parser.add_argument("root")
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--chunks-per-document", type=int, default=20)
+    parser.add_argument("--scopes", type=int, default=4, help="Distinct departement/filiere/module/activite scopes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    manifest = generate_corpus(args.root, args.documents, args.chunks_per_document, args.scopes, args.seed)
+    print(f"{len(manifest['files'])} documents, ~{args.documents * args.chunks_per_document} chunks in {args.root}")
@@ -0,0 +1,47 @@
+import argparse
+import sys
+
+from utils import exporter
+
+# Streams chat history or document metadata as NDJSON / CSV with constant
+# memory (rows are read page by page), e.g.:
+#   python export_data.py chat_history --format csv --filiere-id 1 -o history.csv
+#   python export_data.py chroma --module-id 3 > chunks.ndjson
+
+parser = argparse.ArgumentParser(description="Export chat history and document metadata")
+parser.add_argument("source", choices=["chat_history", "documents", "chroma"])
+parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+parser.add_argument("--db-path", default="./bdd/chatbot_metadata.db")
+parser.add_argument("--chroma-path", default="./chroma_db")
+parser.add_argument("--filiere-id", type=int)
+parser.add_argument("--module-id", type=int)
+parser.add_argument("--date-from", help="YYYY-MM-DD (inclusive)")
+parser.add_argument("--date-to", help="YYYY-MM-DD (inclusive)")
+parser.add_argument("--page-size", type=int, default=1000)
+parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+args = parser.parse_args()
+
+if args.source == "chat_history":
+    rows = exporter.iter_chat_history(args.db_path, args.filiere_id, args.module_id,
+                                      args.date_from, args.date_to, args.page_size)
+    fields = exporter.CHAT_HISTORY_FIELDS
+elif args.source == "documents":
+    rows = exporter.iter_document_metadata(args.db_path, args.filiere_id, args.module_id,
+                                           args.date_from, args.date_to, args.page_size)
+    fields = exporter.DOCUMENT_METADATA_FIELDS
+else:
+    import chromadb
+    collection = chromadb.PersistentClient(path=args.chroma_path).get_collection(name="documents")
+    from utils.filter_manager import FilterManager
+    # Texts of chunks written in "single" storage mode live in the SQLite chunk_store
+    rows = exporter.iter_chroma_documents(collection, args.filiere_id, args.module_id, args.page_size,
+                                          text_loader=FilterManager(args.db_path).get_chunk_texts)
+    fields = exporter.CHROMA_FIELDS
+
+output = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+try:
+    for line in exporter.export_rows(rows, fields, args.format):
+        output.write(line)
+finally:
+    if args.output:
+        output.close()
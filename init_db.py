@@ -1,4 +1,5 @@
 import sqlite3
+from utils.db_schema import ensure_schema
 
 conn = sqlite3.connect('bdd/chatbot_metadata.db')
 cursor = conn.cursor()
@@ -85,4 +86,7 @@ cursor.execute('''
 ''')
 
 conn.commit()
-conn.close()
\ No newline at end of file
+conn.close()
+
+# Indexes and tables added after the initial schema
+ensure_schema('bdd/chatbot_metadata.db')
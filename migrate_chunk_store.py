@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import sqlite3
+
+import chromadb
+
+from utils import chunk_codec
+from utils.db_schema import ensure_schema
+
+# Moves chunk texts to the "single" storage layout (CHUNK_STORAGE_MODE=single):
+#   1. document_metadata.chunk_text -> compressed chunk_store rows, referenced by chunk_ref
+#   2. Chroma records are re-added with their existing embeddings, without the
+#      document text and with chunk_ref in their metadata
+# Both steps are resumable. The Chroma batch in progress is saved to a
+# pending file before it is deleted, and re-added first if the script is
+# interrupted and run again.
+
+parser = argparse.ArgumentParser(description="Migrate chunk texts to the compressed SQLite chunk store")
+parser.add_argument("--db-path", default="./bdd/chatbot_metadata.db")
+parser.add_argument("--chroma-path", default="./chroma_db")
+parser.add_argument("--batch-size", type=int, default=500)
+parser.add_argument("--vacuum", action="store_true", help="VACUUM SQLite afterwards to give the space back to the OS")
+args = parser.parse_args()
+
+ensure_schema(args.db_path)
+codec = chunk_codec.ChunkCodec(args.db_path)
+
+# 1. SQLite
+conn = sqlite3.connect(args.db_path)
+migrated_rows = 0
+while True:
+    rows = conn.execute(
+        "SELECT id, chunk_text FROM document_metadata WHERE chunk_text IS NOT NULL LIMIT ?", (args.batch_size,)
+    ).fetchall()
+    if not rows:
+        break
+    refs = [(row_id, chunk_codec.content_hash(text), text) for row_id, text in rows]
+    conn.executemany(
+        "INSERT OR IGNORE INTO chunk_store (content_hash, data, size) VALUES (?, ?, ?)",
+        [(ref, codec.compress(text), len(text)) for _, ref, text in refs]
+    )
+    conn.executemany(
+        "UPDATE document_metadata SET chunk_ref = ?, chunk_text = NULL WHERE id = ?",
+        [(ref, row_id) for row_id, ref, _ in refs]
+    )
+    conn.commit()
+    migrated_rows += len(rows)
+print(f"SQLite: {migrated_rows} chunk rows moved to chunk_store")
+
+if args.vacuum:
+    conn.execute("VACUUM")
+conn.close()
+
+# 2. Chroma
+collection = chromadb.PersistentClient(path=args.chroma_path).get_or_create_collection(name="documents")
+pending_path = os.path.join(args.chroma_path, "chunk_store_migration.pending.json")
+
+
+def add_batch(batch):
+    collection.add(ids=batch["ids"], embeddings=batch["embeddings"], metadatas=batch["metadatas"])
+
+
+if os.path.exists(pending_path):
+    with open(pending_path, "r", encoding="utf-8") as f:
+        add_batch(json.load(f))
+    os.remove(pending_path)
+    print("Chroma: re-added the batch left pending by a previous run")
+
+all_ids = collection.get(include=[])["ids"]
+migrated_records = 0
+for start in range(0, len(all_ids), args.batch_size):
+    batch = collection.get(ids=all_ids[start:start + args.batch_size], include=["embeddings", "metadatas", "documents"])
+    keep = [i for i, document in enumerate(batch["documents"]) if document is not None]
+    if not keep:
+        continue
+    pending = {
+        "ids": [batch["ids"][i] for i in keep],
+        "embeddings": [list(map(float, batch["embeddings"][i])) for i in keep],
+        "metadatas": [
+            {**batch["metadatas"][i], "chunk_ref": chunk_codec.content_hash(batch["documents"][i])}
+            for i in keep
+        ]
+    }
+    with open(pending_path, "w", encoding="utf-8") as f:
+        json.dump(pending, f)
+    collection.delete(ids=pending["ids"])
+    add_batch(pending)
+    os.remove(pending_path)
+    migrated_records += len(keep)
+
+print(f"Chroma: {migrated_records} records now reference chunk_store instead of storing text")
+print("Set CHUNK_STORAGE_MODE=single so new ingestions use the same layout.")
@@ -37,20 +37,44 @@ import requests
 import json
 from dotenv import load_dotenv
 from langchain_groq import ChatGroq
+import time
 import logging
+from utils import metrics
+from utils import tracing
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+
+LLM_SECONDS = metrics.histogram("edullm_llm_seconds", "LLM call time per backend and outcome", ["backend", "outcome"])
+LLM_TOKENS = metrics.counter("edullm_llm_completion_tokens_total", "Completion tokens generated per backend", ["backend"])
+LLM_TOKENS_PER_SECOND = metrics.histogram(
+    "edullm_llm_tokens_per_second", "Completion tokens per second per call", ["backend"],
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+)
+LLM_FALLBACKS = metrics.counter("edullm_llm_fallbacks_total", "Groq failures that fell back to local Ollama")
+
+
+def _record_tokens(backend, tokens, seconds):
+    if tokens:
+        LLM_TOKENS.inc(tokens, backend=backend)
+        if seconds > 0:
+            LLM_TOKENS_PER_SECOND.observe(tokens / seconds, backend=backend)
+
+
 class OllamaAPI:
-    def __init__(self, api_url="http://localhost:11434"):
-        self.api_url = api_url
+    def __init__(self, api_url=None):
         load_dotenv()
-        GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-        # Instancie le LLM Groq de LangChain
-        self.groq_llm = ChatGroq(api_key=GROQ_API_KEY,
-                                 model="llama3-8b-8192",
-                                 temperature=0.7,
-                                 max_tokens=8192)
+        self.api_url = api_url or os.getenv("OLLAMA_URL", "http://localhost:11434")
+        # "groq" (default): Groq first, local Ollama as fallback; "ollama": local Ollama only
+        self.backend = os.getenv("LLM_BACKEND", "groq")
+        self.groq_llm = None
+        if self.backend == "groq":
+            GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+            # Instancie le LLM Groq de LangChain
+            self.groq_llm = ChatGroq(api_key=GROQ_API_KEY,
+                                     model="llama3-8b-8192",
+                                     temperature=0.7,
+                                     max_tokens=8192)
 
     def chat_with_ollama(self, prompt):
         payload = {
@@ -76,18 +100,27 @@ class OllamaAPI:
         Tente d'abord le LLM en ligne (Groq via LangChain), sinon fallback sur Ollama local.
         """
         # 1. Essayer Groq (en ligne)
-        try:
-            # Utilisation de LangChain pour générer la réponse
-            response = self.groq_llm.invoke(prompt)
-            # Si tu veux juste le texte :
-            if hasattr(response, "content"):
-                return response.content
-            logger.info(f"Groq response: {response}")
-            return str(response)
-        
-        except Exception as e:
-            print(f"Groq failed: {e}, fallback to Ollama local.")
-        logger.error(f"Groq failed: {e}, fallback to Ollama local.")
+        groq_failed = False
+        if self.groq_llm is not None:
+            start = time.perf_counter()
+            try:
+                # Utilisation de LangChain pour générer la réponse
+                with tracing.span("llm.groq", model="llama3-8b-8192"):
+                    response = self.groq_llm.invoke(prompt)
+                elapsed = time.perf_counter() - start
+                LLM_SECONDS.observe(elapsed, backend="groq", outcome="ok")
+                usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+                _record_tokens("groq", usage.get("completion_tokens"), usage.get("completion_time") or elapsed)
+                # Si tu veux juste le texte :
+                if hasattr(response, "content"):
+                    return response.content
+                return str(response)
+
+            except Exception as e:
+                LLM_SECONDS.observe(time.perf_counter() - start, backend="groq", outcome="error")
+                LLM_FALLBACKS.inc()
+                groq_failed = True
+                logger.error(f"Groq failed: {e}, fallback to Ollama local.")
         # 2. Si Groq échoue, fallback sur Ollama local
         try:
             # response = requests.post(
@@ -103,23 +136,34 @@ class OllamaAPI:
             #     },
             #     stream=True
             # )
-            response = requests.post(f"{self.api_url}/api/generate", json=payload, stream=True)
-            if response.status_code == 200:
-                messages = []
-                for line in response.iter_lines():
-                    if line:
-                        try:
-                            json_line = line.decode('utf-8')
-                            data = json.loads(json_line)
-                            messages.append(data.get("response", ""))
-                            if data.get("done", False):
-                                break
-                        except json.JSONDecodeError:
-                            continue
-                return "".join(messages)
-            else:
-                return f"Error: {response.status_code} - {response.text}"
+            start = time.perf_counter()
+            with tracing.span("llm.ollama", model=payload["model"], fallback=groq_failed) as span:
+                # Propagate the trace to the Ollama server
+                traceparent = tracing.current_traceparent()
+                headers = {"traceparent": traceparent} if traceparent else None
+                response = requests.post(f"{self.api_url}/api/generate", json=payload, stream=True, headers=headers)
+                if response.status_code == 200:
+                    messages = []
+                    for line in response.iter_lines():
+                        if line:
+                            try:
+                                json_line = line.decode('utf-8')
+                                data = json.loads(json_line)
+                                messages.append(data.get("response", ""))
+                                if data.get("done", False):
+                                    # eval_duration is in nanoseconds
+                                    _record_tokens("ollama", data.get("eval_count"), (data.get("eval_duration") or 0) / 1e9)
+                                    break
+                            except json.JSONDecodeError:
+                                continue
+                    LLM_SECONDS.observe(time.perf_counter() - start, backend="ollama", outcome="ok")
+                    return "".join(messages)
+                else:
+                    LLM_SECONDS.observe(time.perf_counter() - start, backend="ollama", outcome="error")
+                    span.set_attribute("http.status_code", response.status_code)
+                    return f"Error: {response.status_code} - {response.text}"
         except Exception as e:
+            LLM_SECONDS.observe(time.perf_counter() - start, backend="ollama", outcome="error")
             return f"Error: {str(e)}"
 
 # # Utilisation
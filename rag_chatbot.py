@@ -1,9 +1,21 @@
+import os
+import time
 import chromadb
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from ollama_api import OllamaAPI
+from utils.embedding_backend import get_embedding_backend
+from utils.embedding_cache import EmbeddingCache
 from utils.file_processor import FileProcessor
 from utils.filter_manager import FilterManager
+from utils.vector_store import CompactVectorStore
+from utils.scope_index import ScopeIndex
+from utils.reranker import CrossEncoderReranker
+from utils.context_packer import ContextPacker
+from utils.ingestion_pipeline import IngestionPipeline, Stage
+from utils import chunk_codec
+from utils import metrics
+from utils import tracing
+from utils.log_config import log_event, log_payload, payload_sampled, truncate
 import json
 from datetime import datetime
 import logging
@@ -13,88 +25,376 @@ import re
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+INGESTED_CHUNKS = metrics.counter(
+    "edullm_ingested_chunks_total", "Chunks ingested by embedding source (previous_version, cache, encoded)", ["source"]
+)
+
+
+def _pipeline_gauge(pipeline, field):
+    return lambda: {(name,): values[field] for name, values in pipeline.stats().items()}
+
+
 class RAGChatbot:
-    def __init__(self, ollama_api, db_path="./chroma_db"):
+    def __init__(self, ollama_api, db_path="./chroma_db", embedding_backend=None, vector_store_mode=None,
+                 vector_store_path="./vector_store", use_scope_index=None, scope_index_path="./scope_index",
+                 reranker_model=None, embedding_cache_path="./bdd/embedding_cache.db",
+                 metadata_db_path="./bdd/chatbot_metadata.db"):
         self.ollama_api = ollama_api
-        self.embedding_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        # "sentence-transformers" (fp32), "onnx" or "onnx-int8"; see utils/embedding_backend.py
+        self.embedding_backend = get_embedding_backend(embedding_backend)
         self.file_processor = FileProcessor()
         self.db_path = db_path
         self.client = chromadb.PersistentClient(path=db_path)
         self.collection = self.client.get_or_create_collection(name="documents")
-        self.filter_manager = FilterManager("./bdd/chatbot_metadata.db")
+        self.filter_manager = FilterManager(metadata_db_path)
+
+        # "chroma" (default) or a compact in-process store: "float16" / "int8"
+        self.vector_store_mode = vector_store_mode or os.getenv("VECTOR_STORE_MODE", "chroma")
+        self.compact_store = None
+        if self.vector_store_mode != "chroma":
+            self.compact_store = CompactVectorStore(
+                os.path.join(vector_store_path, self.vector_store_mode), dtype=self.vector_store_mode
+            )
+            if self.compact_store.count != self.collection.count():
+                self.compact_store.sync_from_collection(self.collection)
+
+        # Exact per-scope index, also used as a fallback while Chroma is unavailable
+        if use_scope_index is None:
+            use_scope_index = os.getenv("USE_SCOPE_INDEX", "0") == "1"
+        self.scope_index = None
+        if use_scope_index:
+            self.scope_index = ScopeIndex(scope_index_path)
+            if self.scope_index.count != self.collection.count():
+                self.scope_index.sync_from_collection(self.collection)
+
+        # Optional cross-encoder stage: over-fetch, re-rank, keep top_k (RERANKER_MODEL, e.g.
+        # cross-encoder/mmarco-mMiniLMv2-L12-H384-v1). Skipped when the latency budget is exhausted.
+        reranker_model = reranker_model or os.getenv("RERANKER_MODEL")
+        self.reranker = CrossEncoderReranker(reranker_model) if reranker_model else None
+        self.rerank_fetch_k = int(os.getenv("RERANK_FETCH_K", "30"))
+        self.rerank_budget_ms = float(os.getenv("RERANK_BUDGET_MS", "300"))
+        self.rerank_min_score = float(os.getenv("RERANK_MIN_SCORE", "0.1"))
+
+        # Token budgets for retrieved/document text per endpoint (chat, summary, quiz)
+        self.context_packer = ContextPacker()
+
+        # "duplicate": chunk text in document_metadata and in Chroma (legacy layout)
+        # "single": text only in the compressed SQLite chunk_store, Chroma keeps vectors + chunk_ref
+        self.chunk_storage_mode = os.getenv("CHUNK_STORAGE_MODE", "duplicate")
+
+        # Content-addressed cache of chunk embeddings (sha256 of the text + model), shared by all scopes
+        self.embedding_cache = None
+        if os.getenv("EMBEDDING_CACHE", "1") == "1":
+            self.embedding_cache = EmbeddingCache(
+                embedding_cache_path,
+                model=f"{self.embedding_backend.model_name}:{self.embedding_backend.name}",
+                max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+            )
+
+        # Ingestion stages connected by bounded queues; workers per stage from INGEST_STAGE_WORKERS,
+        # e.g. "read=2,clean=2,chunk=1,embed=1,write=1". The writer is exclusive: concurrent
+        # ingestions (INGEST_WORKERS) never write to SQLite and Chroma at the same time
+        stage_workers = dict(
+            (name.strip(), int(count)) for name, count in
+            (item.split("=") for item in os.getenv("INGEST_STAGE_WORKERS", "").split(",") if "=" in item)
+        )
+        self.ingestion_pipeline = IngestionPipeline([
+            Stage("read", self._read_stage, stage_workers.get("read", 1)),
+            Stage("clean", self._clean_stage, stage_workers.get("clean", 1)),
+            Stage("chunk", self._chunk_stage, stage_workers.get("chunk", 1)),
+            Stage("embed", self._embed_stage, stage_workers.get("embed", 1)),
+            Stage("write", self._write_stage, stage_workers.get("write", 1), exclusive=True),
+        ], queue_size=int(os.getenv("INGEST_QUEUE_SIZE", "4")))
+        for field in ("busy_seconds", "blocked_seconds", "idle_seconds"):
+            metrics.gauge(f"edullm_ingestion_stage_{field}", f"Ingestion pipeline {field.replace('_', ' ')} per stage",
+                          ["stage"], function=_pipeline_gauge(self.ingestion_pipeline, field))
+        metrics.gauge("edullm_ingestion_stage_chunks_per_second", "Chunks per busy second per ingestion stage",
+                      ["stage"], function=_pipeline_gauge(self.ingestion_pipeline, "chunks_per_second"))
+
+        # Finish deletions interrupted between the SQLite commit and the vector stores
+        self.replay_deletion_journal()
 
     def normalize_embedding(self, embedding):
         norm = np.linalg.norm(embedding)
         return embedding / norm if norm > 0 else embedding
 
+    def encode(self, texts):
+        return [self.normalize_embedding(embedding) for embedding in self.embedding_backend.encode(texts)]
+
+    def encode_chunks(self, chunks):
+        """Normalized chunk embeddings as lists, served from the embedding cache when possible"""
+        if self.embedding_cache is None:
+            INGESTED_CHUNKS.inc(len(chunks), source="encoded")
+            return [embedding.tolist() for embedding in self.encode(chunks)]
+        embeddings = self.embedding_cache.get_many(chunks)
+        missing = [i for i in range(len(chunks)) if i not in embeddings]
+        INGESTED_CHUNKS.inc(len(embeddings), source="cache")
+        INGESTED_CHUNKS.inc(len(missing), source="encoded")
+        if missing:
+            encoded = [embedding.tolist() for embedding in self.encode([chunks[i] for i in missing])]
+            self.embedding_cache.put_many([chunks[i] for i in missing], encoded)
+            embeddings.update(zip(missing, encoded))
+        return [embeddings[i] for i in range(len(chunks))]
+
     def check_if_document_exists(self, file_hash):
+        """Served by the documents table (primary key); Chroma is only asked for ids, one at most"""
+        if self.filter_manager.get_document_chunk_count(file_hash) is not None:
+            return True
         try:
-            results = self.collection.get(where={"file_hash": file_hash})
+            results = self.collection.get(where={"file_hash": file_hash}, limit=1, include=[])
             return len(results['ids']) > 0
         except Exception as e:
             logger.warning(f"Error checking document existence: {e}")
             return False
 
+    def count_document_chunks(self, file_hash):
+        """Number of Chroma records of a document, fetching ids only"""
+        return len(self.collection.get(where={"file_hash": file_hash}, include=[])['ids'])
+
+    def _delete_vectors(self, chunk_counts, batch_size=5000):
+        """
+        Remove documents from Chroma and the in-process indexes without reading their records.
+
+        Documents with a known chunk count are deleted by their deterministic ids
+        ({file_hash}_{i}); the others by a where-filter resolved to ids only (include=[]).
+        Returns the number of Chroma ids deleted.
+        """
+        ids = []
+        for file_hash, chunk_count in chunk_counts.items():
+            if chunk_count is None:
+                ids.extend(self.collection.get(where={"file_hash": file_hash}, include=[])['ids'])
+            else:
+                ids.extend(f"{file_hash}_{i}" for i in range(chunk_count))
+        for start in range(0, len(ids), batch_size):
+            self.collection.delete(ids=ids[start:start + batch_size])
+        for file_hash in chunk_counts:
+            if self.compact_store is not None:
+                self.compact_store.delete(file_hash=file_hash)
+            if self.scope_index is not None:
+                self.scope_index.delete(file_hash)
+        return len(ids)
+
+    def delete_documents(self, file_hashes):
+        """
+        Delete documents from SQLite, Chroma and the in-process indexes.
+
+        SQLite rows are removed in one transaction that also records the documents in
+        deletion_journal; the journal entries are cleared once the vectors are gone,
+        and replayed on startup otherwise, so both stores end up consistent.
+
+        Returns:
+            dict with sqlite_deleted (file_hash -> chunk rows) and chromadb_deleted
+        """
+        file_hashes = list(dict.fromkeys(file_hashes))
+        sqlite_deleted = self.filter_manager.delete_documents(file_hashes)
+        chromadb_deleted = self._apply_journaled_deletions(file_hashes)
+        logger.info(f"Deleted {len(file_hashes)} documents ({chromadb_deleted} vectors)")
+        return {"sqlite_deleted": sqlite_deleted, "chromadb_deleted": chromadb_deleted}
+
+    def _apply_journaled_deletions(self, file_hashes):
+        pending = self.filter_manager.get_pending_deletions()
+        deleted = self._delete_vectors({file_hash: pending.get(file_hash) for file_hash in file_hashes})
+        self.filter_manager.clear_deletion_journal(file_hashes)
+        return deleted
+
+    def replay_deletion_journal(self):
+        pending = self.filter_manager.get_pending_deletions()
+        if not pending:
+            return
+        logger.info(f"Replaying {len(pending)} interrupted document deletions")
+        try:
+            self._delete_vectors(pending)
+            self.filter_manager.clear_deletion_journal(list(pending))
+        except Exception as e:
+            logger.error(f"Error replaying deletion journal: {e}")
+
     def delete_existing_document(self, file_hash):
+        """Remove a document's vectors only (re-ingestion); SQLite rows are replaced by insert_document"""
+        deleted = 0
         try:
-            results = self.collection.get(where={"file_hash": file_hash})
-            if results['ids']:
-                self.collection.delete(ids=results['ids'])
-                logger.info(f"Deleted {len(results['ids'])} existing chunks for hash {file_hash}")
+            deleted = self._delete_vectors({file_hash: self.filter_manager.get_document_chunk_count(file_hash)})
+            logger.info(f"Deleted {deleted} existing chunks for hash {file_hash}")
         except Exception as e:
             logger.error(f"Error deleting existing document: {e}")
+        return deleted
+
+    def _read_stage(self, job):
+        content = self.file_processor.read_file(job["file_path"])
+        file_hash = self.file_processor.calculate_hash(content)
+        exists = self.check_if_document_exists(file_hash)
+        if file_hash in self.file_processor.processed_hashes and exists:
+            logger.info(f"File {job['file_path']} already processed (hash: {file_hash})")
+            job["result"] = {"status": "error", "message": f"File {job['file_path']} already processed and exists in database."}
+            return job
+        self.file_processor.processed_hashes.add(file_hash)
+        job.update(content=content, file_hash=file_hash, exists=exists)
+        return job
+
+    def _clean_stage(self, job):
+        job["text"] = self.file_processor.clean_text(job.pop("content"))
+        return job
+
+    def _chunk_stage(self, job):
+        job["chunks"] = self.file_processor.split_into_chunks(job.pop("text"))
+        logger.info(f"Processed file {job['file_path']}: {len(job['chunks'])} chunks created")
+        return job
+
+    def _embed_stage(self, job):
+        chunks, file_hash = job["chunks"], job["file_hash"]
+        # Same file re-ingested, or a new version of the same filename in the same scope:
+        # only chunks whose content changed are embedded again
+        current = self.filter_manager.find_document(
+            job["base_filename"], job["departement_id"], job["filiere_id"], job["module_id"],
+            job["activite_id"], job["profile_id"], job["user_id"]
+        )
+        replaces = current["file_hash"] if current and current["file_hash"] != file_hash else None
+        previous_hash = file_hash if job["exists"] else replaces
+        version = 1
+        if current:
+            version = current["version"] + (1 if replaces else 0)
+
+        embeddings = self.reuse_embeddings(previous_hash, chunks) if previous_hash else {}
+        reused_chunks = len(embeddings)
+        INGESTED_CHUNKS.inc(reused_chunks, source="previous_version")
+        changed = [i for i in range(len(chunks)) if i not in embeddings]
+        if changed:
+            embeddings.update(zip(changed, self.encode_chunks([chunks[i] for i in changed])))
+        job.update(
+            embeddings=[embeddings[i] for i in range(len(chunks))], previous_hash=previous_hash, replaces=replaces,
+            version=version, reused_chunks=reused_chunks, embedded_chunks=len(changed)
+        )
+        return job
+
+    def _write_stage(self, job):
+        chunks, embeddings, file_hash = job["chunks"], job.pop("embeddings"), job["file_hash"]
+        file_path, replaces = job["file_path"], job["replaces"]
+        if job["exists"]:
+            self.delete_existing_document(file_hash)
+
+        ids = [f"{file_hash}_{i}" for i in range(len(chunks))]
+        metadatas = [{
+            "base_filename": job["base_filename"],
+            "file_hash": file_hash,
+            "chunk_index": i,
+            "departement_id": job["departement_id"],
+            "filiere_id": job["filiere_id"],
+            "module_id": job["module_id"],
+            "activite_id": job["activite_id"],
+            "profile_id": job["profile_id"],
+            "user_id": job["user_id"]
+        } for i in range(len(chunks))]
+        store_text_inline = self.chunk_storage_mode != "single"
+        if not store_text_inline:
+            for metadata, chunk in zip(metadatas, chunks):
+                metadata["chunk_ref"] = chunk_codec.content_hash(chunk)
+
+        # Vectors first: SQLite rows are what marks a document as ingested, so they must
+        # never exist without their vectors
+        self.collection.add(
+            documents=chunks if store_text_inline else None,
+            embeddings=embeddings,
+            metadatas=metadatas,
+            ids=ids
+        )
+        if not self.filter_manager.insert_document(
+            job["base_filename"], file_hash, chunks, job["departement_id"], job["filiere_id"], job["module_id"],
+            job["activite_id"], job["profile_id"], job["user_id"],
+            store_text_inline=store_text_inline, version=job["version"], replaces=replaces, reused_chunks=job["reused_chunks"]
+        ):
+            self.collection.delete(ids=ids)
+            job["result"] = {"status": "error", "message": f"Error indexing file {file_path}: metadata could not be saved."}
+            return job
+
+        if self.compact_store is not None:
+            self.compact_store.add(ids, embeddings, metadatas)
+        if self.scope_index is not None:
+            self.scope_index.add(ids, embeddings, metadatas)
+        if replaces:
+            self._apply_journaled_deletions([replaces])
+
+        message = f"File {file_path} indexed successfully. {len(chunks)} chunks added."
+        if job["previous_hash"]:
+            message += f" Version {job['version']}: {job['embedded_chunks']} chunks embedded, {job['reused_chunks']} reused."
+        job["result"] = {"status": "success", "message": message}
+        return job
+
+    def ingest_files(self, files):
+        """
+        Ingest many files through the staged pipeline (read, clean, chunk, embed, write).
+
+        Args:
+            files: iterable of dicts with base_filename, file_path and the scope ids
+                (departement_id, filiere_id, module_id, activite_id, profile_id, user_id)
+
+        Returns:
+            One result dict per file, in input order
+        """
+        files = [dict(job) for job in files]
+        with tracing.span("ingest.batch", files=len(files)):
+            return [job["result"] for job in self.ingestion_pipeline.run(files)]
 
     def ingestion_file(self, base_filename, file_path, departement_id, filiere_id, module_id, activite_id, profile_id, user_id):
+        return self.ingest_files([{
+            "base_filename": base_filename,
+            "file_path": file_path,
+            "departement_id": departement_id,
+            "filiere_id": filiere_id,
+            "module_id": module_id,
+            "activite_id": activite_id,
+            "profile_id": profile_id,
+            "user_id": user_id
+        }])[0]
+
+    def reuse_embeddings(self, previous_hash, chunks):
+        """Stored embeddings of a previous version's chunks with identical content: chunk position -> embedding"""
+        previous = self.filter_manager.get_chunk_hashes(previous_hash)
+        wanted = {}
+        for i, chunk in enumerate(chunks):
+            chunk_index = previous.get(chunk_codec.content_hash(chunk))
+            if chunk_index is not None:
+                wanted[i] = f"{previous_hash}_{chunk_index}"
+        if not wanted:
+            return {}
         try:
-            chunks, file_hash = self.file_processor.process_file(file_path)
-
-            if chunks is None:
-                if self.check_if_document_exists(file_hash):
-                    return {"status": "error", "message": f"File {file_path} already processed and exists in database."}
-                else:
-                    content = self.file_processor.read_file(file_path)
-                    file_hash = self.file_processor.calculate_hash(content)
-                    if file_hash in self.file_processor.processed_hashes:
-                        self.file_processor.processed_hashes.remove(file_hash)
-                    chunks, file_hash = self.file_processor.process_file(file_path)
-
-            if self.check_if_document_exists(file_hash):
-                self.delete_existing_document(file_hash)
-
-            embeddings = [self.normalize_embedding(self.embedding_model.encode([chunk])[0]).tolist() for chunk in chunks]
-            ids = [f"{file_hash}_{i}" for i in range(len(chunks))]
-            metadatas = [{
-                "base_filename": base_filename,
-                "file_hash": file_hash,
-                "chunk_index": i,
-                "departement_id": departement_id,
-                "filiere_id": filiere_id,
-                "module_id": module_id,
-                "activite_id": activite_id,
-                "profile_id": profile_id,
-                "user_id": user_id
-            } for i in range(len(chunks))]
-
-            for i, chunk in enumerate(chunks):
-                self.filter_manager.insert_metadata_sqlite(
-                    base_filename, file_hash, i, chunk, departement_id, filiere_id, module_id, activite_id, profile_id, user_id
-                )
-
-            self.collection.add(
-                documents=chunks,
-                embeddings=embeddings,
-                metadatas=metadatas,
-                ids=ids
+            stored = self.collection.get(ids=list(set(wanted.values())), include=["embeddings"])
+        except Exception as e:
+            logger.warning(f"Could not load embeddings of {previous_hash}, re-embedding all chunks: {e}")
+            return {}
+        by_id = {chunk_id: list(map(float, embedding)) for chunk_id, embedding in zip(stored['ids'], stored['embeddings'])}
+        return {i: by_id[chunk_id] for i, chunk_id in wanted.items() if chunk_id in by_id}
+
+    def _with_documents(self, results):
+        results['documents'] = [self.filter_manager.get_chunk_texts(results['ids'][0])]
+        return results
+
+    def query_vectors(self, query_embedding, n_results, where_clause):
+        """Query the configured vector store and return a Chroma-style result including documents"""
+        scope = ScopeIndex.scope_from_where(where_clause)
+        if self.scope_index is not None and scope is not None and self.scope_index.has_scope(scope):
+            return self._with_documents(self.scope_index.query(query_embedding, n_results, where_clause))
+        if self.compact_store is not None:
+            return self._with_documents(self.compact_store.query(query_embedding, n_results, where_clause))
+        try:
+            results = self.collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                where=where_clause
             )
-
-            return {"status": "success", "message": f"File {file_path} indexed successfully. {len(chunks)} chunks added."}
-
+            # Records written in "single" storage mode have no document in Chroma
+            if any(document is None for document in results['documents'][0]):
+                results = self._with_documents(results)
+            return results
         except Exception as e:
-            logger.error(f"Error indexing file {file_path}: {str(e)}")
-            return {"status": "error", "message": f"Error indexing file {file_path}: {str(e)}"}
-
-    def find_relevant_context(self, user_query, departement_id, filiere_id, module_id, activite_id, profile_id, user_id, top_k=3, similarity_threshold=0.45):
-        query_embedding = self.normalize_embedding(self.embedding_model.encode([user_query])[0]).tolist()
+            if self.scope_index is None or scope is None:
+                raise
+            logger.warning(f"Chroma query failed ({e}), falling back to the scope index")
+            return self._with_documents(self.scope_index.query(query_embedding, n_results, where_clause))
+
+    def find_relevant_context(self, user_query, departement_id, filiere_id, module_id, activite_id, profile_id, user_id, top_k=3, similarity_threshold=0.45,
+                              fetch_k=None, latency_budget_ms=None):
+        start = time.perf_counter()
+        with metrics.STAGE_SECONDS.time(stage="query_encode"), tracing.span("embedding"):
+            query_embedding = self.encode([user_query])[0].tolist()
         where_clause = {
             "$and": [
                 {"departement_id": departement_id},
@@ -107,14 +407,31 @@ class RAGChatbot:
         }
 
         try:
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k,
-                where=where_clause
-            )
+            n_results = max(top_k, fetch_k or self.rerank_fetch_k) if self.reranker else top_k
+            with metrics.STAGE_SECONDS.time(stage="retrieval"), tracing.span("retrieval", n_results=n_results) as span:
+                results = self.query_vectors(query_embedding, n_results, where_clause)
+                span.set_attribute("results", len(results['ids'][0]))
+            candidates = [
+                (distance, document)
+                for distance, document in zip(results['distances'][0], results['documents'][0])
+                if document is not None
+            ]
+
+            if self.reranker and candidates:
+                if latency_budget_ms is None:
+                    latency_budget_ms = self.rerank_budget_ms
+                budget = latency_budget_ms / 1000
+                elapsed = time.perf_counter() - start
+                if elapsed + self.reranker.estimate_seconds(len(candidates)) <= budget:
+                    with metrics.STAGE_SECONDS.time(stage="rerank"), tracing.span("rerank", candidates=len(candidates)):
+                        scores = self.reranker.score(user_query, [document for _, document in candidates])
+                    ranked = sorted(zip(scores, candidates), key=lambda item: item[0], reverse=True)
+                    relevant_chunks = [document for score, (_, document) in ranked[:top_k] if score >= self.rerank_min_score]
+                    return relevant_chunks if relevant_chunks else None
+                logger.info(f"Skipping re-ranking: {elapsed * 1000:.0f} ms elapsed, budget {budget * 1000:.0f} ms")
 
             relevant_chunks = []
-            for distance, document in zip(results['distances'][0], results['documents'][0]):
+            for distance, document in candidates[:top_k]:
                 if 1 - distance >= similarity_threshold:
                     relevant_chunks.append(document)
             return relevant_chunks if relevant_chunks else None
@@ -123,10 +440,20 @@ class RAGChatbot:
             logger.error(f"Error finding relevant context: {e}")
             return None
 
+    @metrics.timed(metrics.REQUEST_SECONDS, operation="chat")
+    @tracing.traced("rag.chat")
     def generate_response(self, user_query, departement_id, filiere_id, module_id, activite_id, profile_id, user_id):
-        logger.info(f"Generating response for query: {user_query}, filters: {departement_id}, {filiere_id}, {module_id}, {activite_id}, {profile_id}, {user_id}")
+        sampled = payload_sampled(logger)
+        log_event(logger, "chat.request", user_id=user_id, departement_id=departement_id, filiere_id=filiere_id,
+                  module_id=module_id, activite_id=activite_id, profile_id=profile_id, query=user_query)
         context = self.find_relevant_context(user_query, departement_id, filiere_id, module_id, activite_id, profile_id, user_id)
-        logger.info(f"Retrieved context: {context}")
+        prompt_start = time.perf_counter()
+        with tracing.span("prompt_build"):
+            if context:
+                context = self.context_packer.pack(context, "chat")
+        log_event(logger, "chat.context", chunks=len(context) if context else 0,
+                  chars=sum(len(chunk) for chunk in context) if context else 0)
+        log_payload(logger, "chat.context", sampled, context=context)
 
         prompt = (
             f"Contexte : {' '.join(context) if context else 'Aucun contexte disponible.'}\n\n"
@@ -137,15 +464,40 @@ class RAGChatbot:
             f"Réponse :"
         )
 
-        logger.info(f"Sending prompt to Ollama: {prompt}")
-        response = self.ollama_api.chat_with_ollama(prompt)
-        logger.info(f"Ollama response: {response}")
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - prompt_start, stage="prompt_build")
 
-        self.filter_manager.save_chat_history(
-            user_id, user_query, response, departement_id, filiere_id, module_id, activite_id, profile_id
-        )
+        log_payload(logger, "chat.prompt", sampled, prompt=prompt)
+        with metrics.STAGE_SECONDS.time(stage="llm"), tracing.span("llm", prompt_chars=len(prompt)):
+            response = self.ollama_api.chat_with_ollama(prompt)
+        log_event(logger, "chat.response", prompt_chars=len(prompt), response_chars=len(response or ""))
+        log_payload(logger, "chat.response", sampled, response=response)
+
+        with metrics.STAGE_SECONDS.time(stage="chat_history_write"), tracing.span("db.chat_history_write"):
+            self.filter_manager.save_chat_history(
+                user_id, user_query, response, departement_id, filiere_id, module_id, activite_id, profile_id
+            )
         return response
 
+    def get_document_chunks(self, file_hash):
+        """Chunks of one document in reading order, from SQLite (works for both storage modes)"""
+        chunks = self.filter_manager.get_document_chunks(file_hash)
+        if chunks:
+            return chunks
+        # Chroma does not guarantee id order
+        results = self.collection.get(where={"file_hash": file_hash}, include=["documents", "metadatas"])
+        ordered = sorted(zip(results['metadatas'], results['documents']), key=lambda item: item[0].get("chunk_index", 0))
+        return [document for _, document in ordered if document is not None]
+
+    def pack_documents(self, documents, endpoint):
+        """Share the endpoint budget evenly between documents so every selected file is represented"""
+        share = self.context_packer.budgets[endpoint] // max(len(documents), 1)
+        packed = []
+        for chunks in documents:
+            packed.extend(self.context_packer.pack(chunks, endpoint, budget=share))
+        return packed
+
+    @metrics.timed(metrics.REQUEST_SECONDS, operation="summary")
+    @tracing.traced("rag.summary")
     def generate_summary(self, file_hashes: List[str], level="simplified"):
         try:
             if not file_hashes:
@@ -153,20 +505,22 @@ class RAGChatbot:
 
             # Retrieve all chunks for the given file hashes
             chunks = []
+            documents = []
             missing_hashes = []
             for file_hash in file_hashes:
-                results = self.collection.get(where={"file_hash": file_hash})
-                if not results['documents']:
+                document_chunks = self.get_document_chunks(file_hash)
+                if not document_chunks:
                     logger.warning(f"No documents found for hash {file_hash}")
                     missing_hashes.append(file_hash)
                     continue
-                chunks.extend(results['documents'])
+                documents.append(document_chunks)
+                chunks.extend(document_chunks)
 
             if not chunks:
                 return f"Aucun document trouvé pour les hashes fournis: {', '.join(missing_hashes)}."
 
             logger.info(f"Found {len(chunks)} chunks for file hashes {file_hashes}")
-            full_text = "\n".join(chunks)
+            full_text = "\n".join(self.pack_documents(documents, "summary"))
 
             if level == "simplified":
                 prompt = (
@@ -185,8 +539,10 @@ class RAGChatbot:
                     f"Réponse en français :"
                 )
 
-            logger.info(f"Generating summary for {len(chunks)} chunks")
+            log_event(logger, "summary.request", summary_level=level, chunks=len(chunks), prompt_chars=len(prompt))
             summary = self.ollama_api.chat_with_ollama(prompt)
+            log_event(logger, "summary.response", response_chars=len(summary or ""))
+            log_payload(logger, "summary.response", payload_sampled(logger), response=summary)
 
             if not summary or summary.strip() == "":
                 return "Erreur lors de la génération du résumé."
@@ -197,6 +553,8 @@ class RAGChatbot:
             logger.error(f"Error generating summary: {e}")
             return f"Erreur lors de la génération du résumé: {str(e)}"
 
+    @metrics.timed(metrics.REQUEST_SECONDS, operation="quiz")
+    @tracing.traced("rag.quiz")
     def generate_quiz(self, file_hashes: List[str], num_questions=5, bloom_level=None):
         try:
             if not file_hashes:
@@ -204,23 +562,25 @@ class RAGChatbot:
 
             # Récupérer les chunks associés
             chunks = []
+            documents = []
             missing_hashes = []
             chunk_counts = {}
 
             for file_hash in file_hashes:
-                results = self.collection.get(where={"file_hash": file_hash})
-                if not results['documents']:
+                document_chunks = self.get_document_chunks(file_hash)
+                if not document_chunks:
                     logger.warning(f"No documents found for hash {file_hash}")
                     missing_hashes.append(file_hash)
                     continue
-                chunk_counts[file_hash] = len(results['documents'])
-                chunks.extend(results['documents'])
+                chunk_counts[file_hash] = len(document_chunks)
+                documents.append(document_chunks)
+                chunks.extend(document_chunks)
 
             if not chunks:
                 return {"status": "error", "message": f"Aucun document trouvé pour les hashes fournis: {', '.join(missing_hashes)}."}
 
             logger.info(f"Found {len(chunks)} chunks for file hashes {file_hashes}: {chunk_counts}")
-            full_text = "\n".join(chunks)
+            full_text = "\n".join(self.pack_documents(documents, "quiz"))
 
             # Déterminer le niveau Bloom
             bloom_instruction = (
@@ -243,10 +603,9 @@ class RAGChatbot:
             )
 
             response = self.ollama_api.chat_with_ollama(prompt)
-            logger.info(f"Raw quiz response: {response}")
+            log_payload(logger, "quiz.response", payload_sampled(logger), response=response)
 
             cleaned_response = self._clean_json_response(response)
-            logger.info(f"Cleaned quiz response: {cleaned_response}")
 
             try:
                 questions = json.loads(cleaned_response)
@@ -255,7 +614,8 @@ class RAGChatbot:
                 if isinstance(questions, list):
                     questions = {"questions": questions[:num_questions]}
 
-                logger.info(f"Parsed JSON: {json.dumps(questions, indent=2)}")
+                log_event(logger, "quiz.response", response_chars=len(str(response)), json_chars=len(cleaned_response),
+                          questions=len(questions.get("questions") or []) if isinstance(questions, dict) else None)
 
                 if not isinstance(questions, dict) or "questions" not in questions:
                     raise ValueError("Structure JSON invalide : il manque la clé 'questions'.")
@@ -289,7 +649,7 @@ class RAGChatbot:
 
             except json.JSONDecodeError as e:
                 logger.error(f"Erreur de parsing JSON : {e}")
-                logger.error(f"Réponse JSON brute : {cleaned_response}")
+                logger.error(f"Réponse JSON brute : {truncate(cleaned_response)}")
                 return {"status": "error", "message": f"Erreur de parsing JSON : {str(e)}"}
             except ValueError as e:
                 logger.error(f"Validation des questions échouée : {e}")
@@ -318,9 +678,7 @@ class RAGChatbot:
         # Trouver la première accolade ouvrante et extraire à partir de là
         match = re.search(r'({.*)', cleaned, re.DOTALL)
         if match:
-            cleaned_json = match.group(1).strip()
-            logger.info(f"Cleaned JSON response: {cleaned_json}")
-            return cleaned_json
+            return match.group(1).strip()
         else:
             logger.error("Aucune structure JSON détectée dans la réponse.")
             return ""
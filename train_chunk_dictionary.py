@@ -0,0 +1,59 @@
+import argparse
+import sqlite3
+
+from utils import chunk_codec
+from utils.db_schema import ensure_schema
+
+# Trains a zstd dictionary on the stored chunk texts (our course material is
+# repetitive French academic text, which small chunks compress poorly on their
+# own) and optionally recompresses chunk_store with it. New rows use it once
+# CHUNK_COMPRESSION=zstd is set.
+
+parser = argparse.ArgumentParser(description="Train a zstd dictionary for chunk_store compression")
+parser.add_argument("--db-path", default="./bdd/chatbot_metadata.db")
+parser.add_argument("--dict-size", type=int, default=65536)
+parser.add_argument("--max-samples", type=int, default=20000)
+parser.add_argument("--recompress", action="store_true", help="Rewrite existing chunk_store rows with the new dictionary")
+parser.add_argument("--batch-size", type=int, default=500)
+args = parser.parse_args()
+
+ensure_schema(args.db_path)
+reader = chunk_codec.ChunkCodec(args.db_path)
+
+conn = sqlite3.connect(args.db_path)
+samples = [row[0] for row in conn.execute(
+    "SELECT chunk_text FROM document_metadata WHERE chunk_text IS NOT NULL LIMIT ?", (args.max_samples,)
+)]
+remaining = args.max_samples - len(samples)
+if remaining > 0:
+    samples += [reader.decompress(row[0]) for row in conn.execute("SELECT data FROM chunk_store LIMIT ?", (remaining,))]
+conn.close()
+
+total_bytes = sum(len(sample.encode("utf-8")) for sample in samples)
+# zstd needs roughly 10x more sample data than the dictionary size
+dict_size = min(args.dict_size, max(total_bytes // 10, 1024))
+dict_id = chunk_codec.train_dictionary(args.db_path, samples, dict_size=dict_size)
+print(f"Trained dictionary {dict_id} ({dict_size} bytes) on {len(samples)} chunks ({total_bytes} bytes)")
+
+if args.recompress:
+    writer = chunk_codec.ChunkCodec(args.db_path, method="zstd")
+    conn = sqlite3.connect(args.db_path)
+    last_rowid, before, after = 0, 0, 0
+    while True:
+        rows = conn.execute(
+            "SELECT rowid, content_hash, data FROM chunk_store WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (last_rowid, args.batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        updates = []
+        for rowid, content_hash, data in rows:
+            blob = writer.compress(reader.decompress(data))
+            before += len(data)
+            after += len(blob)
+            updates.append((blob, content_hash))
+        conn.executemany("UPDATE chunk_store SET data = ? WHERE content_hash = ?", updates)
+        conn.commit()
+        last_rowid = rows[-1][0]
+    conn.close()
+    print(f"Recompressed chunk_store: {before} -> {after} bytes")
@@ -1,10 +1,12 @@
 import sqlite3
 from typing import Optional, Union
 from api.models import Departement, Filiere, Module, Activite
+from utils.hierarchy_cache import get_hierarchy_cache
 
 class ResourceManager:
     def __init__(self, db_path: str):
         self.db_path = db_path
+        self.hierarchy_cache = get_hierarchy_cache(db_path)
 
     def _connect(self):
         conn = sqlite3.connect(self.db_path)
@@ -29,6 +31,7 @@ class ResourceManager:
             cursor = conn.cursor()
             cursor.execute("INSERT INTO departements (nom) VALUES (?)", (data.nom,))
             conn.commit()
+            self.hierarchy_cache.invalidate()
             return cursor.lastrowid
 
     def update_departement(self, id: int, data: Departement) -> int:
@@ -36,6 +39,7 @@ class ResourceManager:
             cursor = conn.cursor()
             cursor.execute("UPDATE departements SET nom = ? WHERE id = ?", (data.nom, id))
             conn.commit()
+            self.hierarchy_cache.invalidate()
             return cursor.rowcount
 
     def delete_departement(self, id: int) -> Union[int, str]:
@@ -44,6 +48,7 @@ class ResourceManager:
                 cursor = conn.cursor()
                 cursor.execute("DELETE FROM departements WHERE id = ?", (id,))
                 conn.commit()
+                self.hierarchy_cache.invalidate()
                 return cursor.rowcount
         except sqlite3.IntegrityError:
             return "Impossible de supprimer : des filières dépendent de ce département."
@@ -69,6 +74,7 @@ class ResourceManager:
                 (data.nom, data.departement_id)
             )
             conn.commit()
+            self.hierarchy_cache.invalidate()
             return cursor.lastrowid
 
     def update_filiere(self, id: int, data: Filiere) -> int:
@@ -79,6 +85,7 @@ class ResourceManager:
                 (data.nom, data.departement_id, id)
             )
             conn.commit()
+            self.hierarchy_cache.invalidate()
             return cursor.rowcount
 
     def delete_filiere(self, id: int) -> Union[int, str]:
@@ -87,6 +94,7 @@ class ResourceManager:
                 cursor = conn.cursor()
                 cursor.execute("DELETE FROM filieres WHERE id = ?", (id,))
                 conn.commit()
+                self.hierarchy_cache.invalidate()
                 return cursor.rowcount
         except sqlite3.IntegrityError:
             return "Impossible de supprimer : des modules dépendent de cette filière."
@@ -112,6 +120,7 @@ class ResourceManager:
                 (data.nom, data.filiere_id)
             )
             conn.commit()
+            self.hierarchy_cache.invalidate()
             return cursor.lastrowid
 
     def update_module(self, id: int, data: Module) -> int:
@@ -122,6 +131,7 @@ class ResourceManager:
                 (data.nom, data.filiere_id, id)
             )
             conn.commit()
+            self.hierarchy_cache.invalidate()
             return cursor.rowcount
 
     def delete_module(self, id: int) -> Union[int, str]:
@@ -130,6 +140,7 @@ class ResourceManager:
                 cursor = conn.cursor()
                 cursor.execute("DELETE FROM modules WHERE id = ?", (id,))
                 conn.commit()
+                self.hierarchy_cache.invalidate()
                 return cursor.rowcount
         except sqlite3.IntegrityError:
             return "Impossible de supprimer : des activités dépendent de ce module."
@@ -155,6 +166,7 @@ class ResourceManager:
                 (data.nom, data.module_id)
             )
             conn.commit()
+            self.hierarchy_cache.invalidate()
             return cursor.lastrowid
 
     def update_activite(self, id: int, data: Activite) -> int:
@@ -165,6 +177,7 @@ class ResourceManager:
                 (data.nom, data.module_id, id)
             )
             conn.commit()
+            self.hierarchy_cache.invalidate()
             return cursor.rowcount
 
     def delete_activite(self, id: int) -> int:
@@ -172,4 +185,5 @@ class ResourceManager:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM activites WHERE id = ?", (id,))
             conn.commit()
+            self.hierarchy_cache.invalidate()
             return cursor.rowcount
\ No newline at end of file
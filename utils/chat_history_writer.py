@@ -0,0 +1,168 @@
+import os
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import threading
+from typing import List
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+INSERT_CHAT_HISTORY = """
+    INSERT INTO chat_history (user_id, question, answer, timestamp, departement_id, filiere_id, module_id, activite_id, profile_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_FLUSH = object()
+_STOP = object()
+
+
+class ChatHistoryWriter:
+    """Write-behind buffer for chat_history rows.
+
+    Rows are queued by the request thread and inserted by a background thread
+    in batches of up to `batch_size`, at least every `flush_interval` seconds,
+    one transaction per batch. `flush()` writes everything queued so far
+    (readers call it first, so a user sees their last exchange), and `close()`
+    on shutdown drains the queue.
+
+    Durability (CHAT_HISTORY_WRITE_MODE):
+        "async" (default)  rows queued at most flush_interval seconds can be
+                           lost if the process is killed
+        "sync"             every row is committed before the response, as before
+    CHAT_HISTORY_SYNCHRONOUS sets PRAGMA synchronous for the batch commits (FULL or NORMAL).
+    """
+
+    def __init__(self, db_path: str, mode: str = None, batch_size: int = None, flush_interval: float = None,
+                 synchronous: str = None, max_pending: int = 10000):
+        self.db_path = db_path
+        self.mode = mode or os.getenv("CHAT_HISTORY_WRITE_MODE", "async")
+        self.batch_size = batch_size or int(os.getenv("CHAT_HISTORY_BATCH_SIZE", "100"))
+        self.flush_interval = flush_interval or float(os.getenv("CHAT_HISTORY_FLUSH_INTERVAL", "1.0"))
+        self.synchronous = (synchronous or os.getenv("CHAT_HISTORY_SYNCHRONOUS", "FULL")).upper()
+        if self.synchronous not in ("FULL", "NORMAL"):
+            self.synchronous = "FULL"
+        self.queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        metrics.gauge("edullm_chat_history_queue_rows", "Chat history rows waiting for the background writer",
+                      function=lambda: {(): self.queue.qsize()})
+
+    @metrics.timed(metrics.DB_SECONDS, operation="chat_history_batch")
+    def _write(self, rows: List[tuple]):
+        for attempt in range(3):
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            try:
+                conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+                conn.executemany(INSERT_CHAT_HISTORY, rows)
+                conn.commit()
+                return
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Chat history batch of {len(rows)} rows failed (attempt {attempt + 1}): {e}")
+                time.sleep(0.5 * (attempt + 1))
+            except Exception as e:
+                logger.error(f"Error saving chat history: {e}")
+                return
+            finally:
+                conn.close()
+        logger.error(f"Dropped {len(rows)} chat history rows after repeated write failures")
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="chat-history-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            rows, markers = [], 0
+            item = self.queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stop = True
+                if item is _FLUSH or item is _STOP:
+                    markers += 1
+                    break
+                rows.append(item)
+                remaining = deadline - time.monotonic()
+                if len(rows) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if rows:
+                self._write(rows)
+            for _ in range(len(rows) + markers):
+                self.queue.task_done()
+
+    def submit(self, row: tuple):
+        """Queue one chat_history row: (user_id, question, answer, timestamp, departement_id, filiere_id,
+        module_id, activite_id, profile_id)"""
+        if self.mode == "sync" or self._closed:
+            self._write([row])
+            return
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            logger.warning("Chat history queue is full, writing synchronously")
+            self._write([row])
+
+    def flush(self):
+        if self._thread is None or self._closed:
+            return
+        if self.queue.unfinished_tasks:
+            self.queue.put(_FLUSH)
+            self.queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self.queue.put(_STOP)
+            self._thread.join()
+            # Rows submitted while the writer was stopping
+            leftover = []
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _FLUSH and item is not _STOP:
+                    leftover.append(item)
+            if leftover:
+                self._write(leftover)
+            logger.info("Chat history writer flushed and stopped")
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_chat_history_writer(db_path: str) -> ChatHistoryWriter:
+    """Process-wide writer per database, shared by every FilterManager"""
+    key = os.path.abspath(db_path)
+    with _writers_lock:
+        if key not in _writers:
+            _writers[key] = ChatHistoryWriter(db_path)
+        return _writers[key]
+
+
+def close_all():
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.close()
+
+
+atexit.register(close_all)
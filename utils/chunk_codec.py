@@ -0,0 +1,131 @@
+import os
+import zlib
+import struct
+import hashlib
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Chunk text blobs start with a one-byte codec tag so codecs can coexist in
+# chunk_store and be changed without rewriting existing rows.
+RAW = b"\x00"
+ZLIB = b"\x01"
+ZSTD = b"\x02"  # followed by the 4-byte id of the compression_dicts row (0 = no dictionary)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ChunkCodec:
+    """Compresses chunk texts for chunk_store.
+
+    CHUNK_COMPRESSION selects the codec for new rows: "zlib" (default) or
+    "zstd", which uses the latest dictionary trained on the corpus
+    (see train_chunk_dictionary.py) when one exists. Decompression handles
+    every codec regardless of that setting; dictionaries are loaded from
+    compression_dicts and reloaded when an unknown id is met.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, method: Optional[str] = None, level: Optional[int] = None):
+        self.db_path = db_path
+        self.method = (method or os.getenv("CHUNK_COMPRESSION", "zlib")).lower()
+        if self.method == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed, falling back to zlib chunk compression")
+            self.method = "zlib"
+        self.level = level if level is not None else (3 if self.method == "zstd" else 6)
+        self._dictionaries = {}
+        self._active_dict_id = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        if self.method == "zstd":
+            self.load_dictionaries()
+
+    def load_dictionaries(self):
+        if self.db_path is None or zstandard is None:
+            return
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute("SELECT id, data FROM compression_dicts ORDER BY id").fetchall()
+        except sqlite3.OperationalError:
+            rows = []
+        finally:
+            conn.close()
+        with self._lock:
+            for dict_id, data in rows:
+                if dict_id not in self._dictionaries:
+                    self._dictionaries[dict_id] = zstandard.ZstdCompressionDict(bytes(data))
+            self._active_dict_id = rows[-1][0] if rows else 0
+            self._local = threading.local()
+
+    def _compressor(self):
+        # zstandard (de)compressors must not be shared between threads
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            dictionary = self._dictionaries.get(self._active_dict_id)
+            compressor = zstandard.ZstdCompressor(level=self.level, dict_data=dictionary)
+            self._local.compressor = compressor
+        return compressor
+
+    def _decompressor(self, dict_id: int):
+        decompressors = getattr(self._local, "decompressors", None)
+        if decompressors is None:
+            decompressors = self._local.decompressors = {}
+        if dict_id not in decompressors:
+            if dict_id and dict_id not in self._dictionaries:
+                self.load_dictionaries()
+                decompressors = self._local.decompressors = {}
+            if dict_id and dict_id not in self._dictionaries:
+                raise ValueError(f"Unknown compression dictionary: {dict_id}")
+            decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=self._dictionaries.get(dict_id))
+        return decompressors[dict_id]
+
+    def compress(self, text: str) -> bytes:
+        data = text.encode("utf-8")
+        if self.method == "zstd":
+            packed = ZSTD + struct.pack(">I", self._active_dict_id) + self._compressor().compress(data)
+        else:
+            packed = ZLIB + zlib.compress(data, self.level)
+        if len(packed) < len(data) + 1:
+            return packed
+        return RAW + data
+
+    def decompress(self, blob: bytes) -> str:
+        codec, payload = blob[:1], blob[1:]
+        if codec == ZLIB:
+            return zlib.decompress(payload).decode("utf-8")
+        if codec == RAW:
+            return bytes(payload).decode("utf-8")
+        if codec == ZSTD:
+            if zstandard is None:
+                raise ValueError("zstandard is required to read zstd-compressed chunks")
+            dict_id = struct.unpack(">I", payload[:4])[0]
+            return self._decompressor(dict_id).decompress(bytes(payload[4:])).decode("utf-8")
+        raise ValueError(f"Unknown chunk codec: {codec!r}")
+
+
+def train_dictionary(db_path: str, samples: List[str], dict_size: int = 112640) -> int:
+    """Train a zstd dictionary on sample chunk texts and store it; returns its compression_dicts id."""
+    if zstandard is None:
+        raise RuntimeError("zstandard is required to train a compression dictionary")
+    dictionary = zstandard.train_dictionary(dict_size, [sample.encode("utf-8") for sample in samples])
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO compression_dicts (data, created_at) VALUES (?, ?)",
+            (dictionary.as_bytes(), datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+        conn.commit()
+        return cursor.lastrowid
+    finally:
+        conn.close()
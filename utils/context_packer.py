@@ -0,0 +1,104 @@
+import os
+import logging
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Prompt budgets (tokens of retrieved/document text) per endpoint, overridable
+# with PROMPT_BUDGET_CHAT, PROMPT_BUDGET_SUMMARY and PROMPT_BUDGET_QUIZ.
+DEFAULT_BUDGETS = {"chat": 1500, "summary": 5000, "quiz": 5000}
+
+
+class TokenCounter:
+    """Counts tokens for the target model.
+
+    Uses tiktoken's cl100k_base when available (close to the llama3 BPE used on
+    Groq), otherwise a characters-per-token estimate tuned for French text.
+    """
+
+    def __init__(self, encoding_name: str = "cl100k_base", chars_per_token: float = 3.5):
+        self.chars_per_token = chars_per_token
+        try:
+            import tiktoken
+            self.encoding = tiktoken.get_encoding(encoding_name)
+        except Exception:
+            logger.info("tiktoken not available, estimating token counts from text length")
+            self.encoding = None
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return int(len(text) / self.chars_per_token) + 1
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            return text if len(tokens) <= max_tokens else self.encoding.decode(tokens[:max_tokens])
+        return text[:int(max_tokens * self.chars_per_token)]
+
+
+class ContextPacker:
+    """Fits retrieved chunks into a per-endpoint token budget.
+
+    Chunks are expected in priority order (relevance for chat, document order
+    for summaries and quizzes). Text repeated across chunks, such as the
+    130-character overlap between consecutive chunks, is kept only once, and
+    the last chunk that does not fit is truncated rather than dropped.
+    """
+
+    def __init__(self, budgets: Optional[dict] = None, max_overlap: int = 200, min_overlap: int = 20,
+                 min_chunk_tokens: int = 32, counter: Optional[TokenCounter] = None):
+        self.budgets = dict(DEFAULT_BUDGETS)
+        for endpoint in self.budgets:
+            value = os.getenv(f"PROMPT_BUDGET_{endpoint.upper()}")
+            if value:
+                self.budgets[endpoint] = int(value)
+        self.budgets.update(budgets or {})
+        self.max_overlap = max_overlap
+        self.min_overlap = min_overlap
+        self.min_chunk_tokens = min_chunk_tokens
+        self.counter = counter or TokenCounter()
+
+    def _overlap(self, left: str, right: str) -> int:
+        """Length of the longest suffix of `left` that is a prefix of `right`."""
+        for size in range(min(len(left), len(right), self.max_overlap), self.min_overlap - 1, -1):
+            if left.endswith(right[:size]):
+                return size
+        return 0
+
+    def _strip_overlap(self, chunk: str, selected: List[str]) -> str:
+        for previous in selected:
+            if chunk in previous:
+                return ""
+            head = self._overlap(previous, chunk)
+            if head:
+                chunk = chunk[head:].lstrip()
+            tail = self._overlap(chunk, previous)
+            if tail:
+                chunk = chunk[:-tail].rstrip()
+            if not chunk:
+                return ""
+        return chunk
+
+    def pack(self, chunks: List[str], endpoint: str = "chat", budget: Optional[int] = None) -> List[str]:
+        if budget is None:
+            budget = self.budgets.get(endpoint, DEFAULT_BUDGETS["chat"])
+        selected = []
+        used = 0
+        for chunk in chunks:
+            text = self._strip_overlap(chunk.strip(), selected)
+            if not text:
+                continue
+            tokens = self.counter.count(text)
+            if used + tokens > budget:
+                remaining = budget - used
+                if remaining >= self.min_chunk_tokens:
+                    selected.append(self.counter.truncate(text, remaining))
+                    used = budget
+                logger.info(f"Context budget reached for {endpoint}: {len(selected)}/{len(chunks)} chunks, {used} tokens")
+                break
+            selected.append(text)
+            used += tokens
+        return selected
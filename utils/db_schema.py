@@ -0,0 +1,159 @@
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Scope dimensions with a per-id document counter in document_counts
+COUNTED_DIMENSIONS = ("departement", "filiere", "module", "activite")
+
+# Idempotent additions on top of the tables created by init_db.py. Applied on
+# startup so existing databases pick them up without a manual migration.
+SCHEMA_STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS idx_document_metadata_hash ON document_metadata (file_hash, chunk_index)",
+    # Keyset pagination of /chat/history per role (admins use the primary key)
+    "CREATE INDEX IF NOT EXISTS idx_chat_history_user ON chat_history (user_id, filiere_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_chat_history_scope ON chat_history (departement_id, filiere_id, id)",
+    # One row per ingested document, maintained with document_metadata
+    """
+    CREATE TABLE IF NOT EXISTS documents (
+        file_hash TEXT PRIMARY KEY,
+        base_filename TEXT,
+        chunk_count INTEGER,
+        total_size INTEGER,
+        departement_id INTEGER,
+        filiere_id INTEGER,
+        module_id INTEGER,
+        activite_id INTEGER,
+        profile_id INTEGER,
+        user_id INTEGER,
+        date_Ingestion TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_documents_date ON documents (date_Ingestion)",
+    # A document's identity across versions: its filename within a full scope
+    """
+    CREATE INDEX IF NOT EXISTS idx_documents_identity
+    ON documents (base_filename, departement_id, filiere_id, module_id, activite_id, profile_id, user_id)
+    """,
+    # One row per ingested version of a document (reused_chunks were not re-embedded)
+    """
+    CREATE TABLE IF NOT EXISTS document_versions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        base_filename TEXT,
+        departement_id INTEGER,
+        filiere_id INTEGER,
+        module_id INTEGER,
+        activite_id INTEGER,
+        profile_id INTEGER,
+        user_id INTEGER,
+        version INTEGER,
+        file_hash TEXT,
+        previous_hash TEXT,
+        chunk_count INTEGER,
+        reused_chunks INTEGER,
+        date_Ingestion TEXT
+    )
+    """,
+    # Documents per scope id ('total' uses ref_id 0), read by /stats
+    """
+    CREATE TABLE IF NOT EXISTS document_counts (
+        dimension TEXT,
+        ref_id INTEGER,
+        count INTEGER,
+        PRIMARY KEY (dimension, ref_id)
+    )
+    """,
+    # Content-addressed, compressed chunk texts (see utils/chunk_codec.py), referenced by
+    # document_metadata.chunk_ref and by the chunk_ref metadata of Chroma records
+    """
+    CREATE TABLE IF NOT EXISTS chunk_store (
+        content_hash TEXT PRIMARY KEY,
+        data BLOB,
+        size INTEGER
+    )
+    """,
+    # Documents removed from SQLite whose vectors still have to be removed from Chroma and
+    # the in-process indexes; replayed on startup if the process stopped in between
+    """
+    CREATE TABLE IF NOT EXISTS deletion_journal (
+        file_hash TEXT PRIMARY KEY,
+        chunk_count INTEGER,
+        created_at TEXT
+    )
+    """,
+    # zstd dictionaries trained on the corpus; chunk_store blobs reference them by id
+    """
+    CREATE TABLE IF NOT EXISTS compression_dicts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data BLOB,
+        created_at TEXT
+    )
+    """,
+]
+
+# Columns added to tables created by init_db.py: (table, column, type)
+ADDED_COLUMNS = [
+    ("document_metadata", "chunk_ref", "TEXT"),
+    # sha256 of the chunk text, compared on re-ingestion to reuse unchanged embeddings
+    ("document_metadata", "chunk_hash", "TEXT"),
+    ("documents", "version", "INTEGER DEFAULT 1"),
+]
+
+# Statements that depend on ADDED_COLUMNS
+POST_COLUMN_STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS idx_document_metadata_chunk_ref ON document_metadata (chunk_ref)",
+]
+
+
+def add_missing_columns(conn):
+    for table, column, column_type in ADDED_COLUMNS:
+        existing = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+
+def rebuild_document_counts(conn):
+    conn.execute("DELETE FROM document_counts")
+    conn.execute("INSERT INTO document_counts (dimension, ref_id, count) SELECT 'total', 0, COUNT(*) FROM documents")
+    for dimension in COUNTED_DIMENSIONS:
+        conn.execute(f"""
+            INSERT INTO document_counts (dimension, ref_id, count)
+            SELECT '{dimension}', {dimension}_id, COUNT(*)
+            FROM documents
+            WHERE {dimension}_id IS NOT NULL
+            GROUP BY {dimension}_id
+        """)
+
+
+def backfill_documents(conn):
+    """Build the documents summary from document_metadata for databases created before it existed."""
+    if conn.execute("SELECT 1 FROM documents LIMIT 1").fetchone():
+        return
+    if not conn.execute("SELECT 1 FROM document_metadata LIMIT 1").fetchone():
+        return
+    logger.info("Backfilling documents summary table from document_metadata")
+    conn.execute("""
+        INSERT INTO documents (file_hash, base_filename, chunk_count, total_size, departement_id, filiere_id,
+                               module_id, activite_id, profile_id, user_id, date_Ingestion)
+        SELECT file_hash, base_filename, COUNT(DISTINCT chunk_index), SUM(LENGTH(chunk_text)), departement_id,
+               filiere_id, module_id, activite_id, profile_id, user_id, MAX(date_Ingestion)
+        FROM document_metadata
+        GROUP BY file_hash
+    """)
+    rebuild_document_counts(conn)
+
+
+def ensure_schema(db_path: str):
+    conn = sqlite3.connect(db_path)
+    try:
+        for statement in SCHEMA_STATEMENTS:
+            conn.execute(statement)
+        add_missing_columns(conn)
+        for statement in POST_COLUMN_STATEMENTS:
+            conn.execute(statement)
+        backfill_documents(conn)
+        conn.commit()
+    except Exception as e:
+        logger.error(f"Error applying schema to {db_path}: {e}")
+    finally:
+        conn.close()
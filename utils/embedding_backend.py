@@ -0,0 +1,195 @@
+import os
+import logging
+from typing import List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
+HF_MODEL_ID = f"sentence-transformers/{DEFAULT_MODEL_NAME}"
+
+
+class EmbeddingBackend:
+    """Base class for sentence embedding backends.
+
+    All backends encode the same model so their vectors are interchangeable
+    with the ones already stored in Chroma.
+    """
+    name = "base"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, batch_size: int = 32):
+        self.model_name = model_name
+        self.batch_size = batch_size
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Reference PyTorch fp32 backend (the vectors the index was built with)."""
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, batch_size: int = 32):
+        super().__init__(model_name, batch_size)
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(
+            self.model.encode(list(texts), batch_size=self.batch_size),
+            dtype=np.float32
+        )
+
+
+class OnnxBackend(EmbeddingBackend):
+    """ONNX Runtime backend, optionally with dynamic int8 quantization.
+
+    The model is exported once to `cache_dir` and reused on the next start.
+    Mean pooling over the attention mask reproduces the SentenceTransformer
+    pooling of paraphrase-multilingual-MiniLM-L12-v2.
+    """
+    name = "onnx"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, batch_size: int = 32,
+                 quantize: bool = False, cache_dir: str = "./models/onnx", max_seq_length: int = 128):
+        super().__init__(model_name, batch_size)
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        self.quantize = quantize
+        self.max_seq_length = max_seq_length
+        model_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        export_dir = os.path.join(cache_dir, model_id.replace("/", "__"))
+
+        if not os.path.exists(os.path.join(export_dir, "model.onnx")):
+            logger.info(f"Exporting {model_id} to ONNX in {export_dir}")
+            model = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+            model.save_pretrained(export_dir)
+            AutoTokenizer.from_pretrained(model_id).save_pretrained(export_dir)
+
+        file_name = "model.onnx"
+        if quantize:
+            file_name = "model_quantized.onnx"
+            if not os.path.exists(os.path.join(export_dir, file_name)):
+                self._quantize(export_dir)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(export_dir, file_name=file_name)
+        if quantize:
+            self.name = "onnx-int8"
+
+    @staticmethod
+    def _quantize(export_dir: str):
+        from optimum.onnxruntime import ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        logger.info(f"Quantizing ONNX model in {export_dir} to int8")
+        quantizer = ORTQuantizer.from_pretrained(export_dir, file_name="model.onnx")
+        qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=export_dir, quantization_config=qconfig)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        texts = list(texts)
+        outputs = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            tokens = self.tokenizer(
+                batch, padding=True, truncation=True,
+                max_length=self.max_seq_length, return_tensors="np"
+            )
+            hidden = np.asarray(self.model(**tokens).last_hidden_state, dtype=np.float32)
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            outputs.append(pooled)
+        if not outputs:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(outputs)
+
+
+def get_embedding_backend(name: str = None, **kwargs) -> EmbeddingBackend:
+    """Build an embedding backend by name.
+
+    Args:
+        name: "sentence-transformers" (default), "onnx" or "onnx-int8".
+            Falls back to the EMBEDDING_BACKEND environment variable.
+    """
+    name = (name or os.getenv("EMBEDDING_BACKEND", SentenceTransformerBackend.name)).lower()
+    if name in ("sentence-transformers", "torch", "fp32"):
+        return SentenceTransformerBackend(**kwargs)
+    if name == "onnx":
+        return OnnxBackend(quantize=False, **kwargs)
+    if name in ("onnx-int8", "int8"):
+        return OnnxBackend(quantize=True, **kwargs)
+    raise ValueError(f"Unknown embedding backend: {name}")
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def check_backend_recall(backend: EmbeddingBackend, collection, sample_size: int = 200,
+                         top_k: int = 10, page_size: int = 1000, text_loader=None) -> dict:
+    """Compare a backend against the fp32 vectors already stored in Chroma.
+
+    For a sample of stored chunks, the chunk text is re-encoded with `backend`
+    and used as a query against the stored index. Its top-k neighbours are
+    compared with those obtained from the stored fp32 vector of the same
+    chunk, so a high recall means the backend can serve queries on the
+    existing index without re-indexing.
+
+    `text_loader(ids)` supplies chunk texts that are not stored in Chroma
+    ("single" chunk storage mode), e.g. FilterManager.get_chunk_texts.
+
+    Returns:
+        dict with recall_at_k, mean_cosine (candidate vs stored vector) and
+        the number of sampled chunks.
+    """
+    ids, vectors, documents = [], [], []
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings", "documents"])
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        vectors.extend(page["embeddings"])
+        documents.extend(page["documents"])
+        offset += len(page["ids"])
+
+    if not ids:
+        return {"status": "error", "message": "Collection is empty."}
+
+    stored = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(ids), size=min(sample_size, len(ids)), replace=False)
+    k = min(top_k, len(ids))
+
+    texts = [documents[i] for i in sample]
+    missing = [j for j, text in enumerate(texts) if text is None]
+    if missing and text_loader is not None:
+        for j, text in zip(missing, text_loader([ids[sample[j]] for j in missing])):
+            texts[j] = text
+    keep = [j for j, text in enumerate(texts) if text is not None]
+    if not keep:
+        return {"status": "error", "message": "No chunk text available for the sampled records."}
+    sample = sample[keep]
+    candidate = _normalize_rows(backend.encode([texts[j] for j in keep]))
+    reference_scores = stored[sample] @ stored.T
+    candidate_scores = candidate @ stored.T
+
+    hits = 0
+    for ref_row, cand_row in zip(reference_scores, candidate_scores):
+        ref_top = set(np.argpartition(-ref_row, k - 1)[:k])
+        cand_top = set(np.argpartition(-cand_row, k - 1)[:k])
+        hits += len(ref_top & cand_top)
+
+    return {
+        "status": "success",
+        "backend": backend.name,
+        "sampled_chunks": int(len(sample)),
+        "top_k": k,
+        "recall_at_k": hits / (len(sample) * k),
+        "mean_cosine": float(np.mean(np.sum(candidate * stored[sample], axis=1)))
+    }
@@ -0,0 +1,136 @@
+import sqlite3
+import time
+import logging
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+from . import chunk_codec
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Persistent, content-addressed cache of chunk embeddings.
+
+    Entries are keyed by the sha256 of the chunk text and the embedding model,
+    so identical chunks ingested under another scope or in another file reuse
+    the same vector. The least recently used entries are evicted once the
+    cache holds more than `max_entries` vectors.
+
+    Reads do not write: the last_used times of hits are buffered and written
+    with the next put_many, or once `touch_batch` of them are pending. The row
+    count is tracked in memory as an upper bound (replaced rows are counted as
+    new), and only recounted when that bound passes `max_entries`.
+    """
+
+    def __init__(self, db_path: str = "./bdd/embedding_cache.db", model: str = "", max_entries: int = 200000,
+                 touch_batch: int = 1000):
+        self.db_path = db_path
+        self.model = model
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # content_hash -> last_used not yet written
+        self._touched = {}
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    content_hash TEXT,
+                    model TEXT,
+                    vector BLOB,
+                    last_used REAL,
+                    PRIMARY KEY (content_hash, model)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+            conn.commit()
+            self._count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        finally:
+            conn.close()
+
+    def get_many(self, texts: List[str]) -> Dict[int, List[float]]:
+        """Cached vectors for the given texts: position -> vector"""
+        hashes = [chunk_codec.content_hash(text) for text in texts]
+        found = {}
+        conn = sqlite3.connect(self.db_path)
+        try:
+            unique = list(dict.fromkeys(hashes))
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ", ".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT content_hash, vector FROM embeddings WHERE model = ? AND content_hash IN ({placeholders})",
+                    (self.model, *batch)
+                ).fetchall()
+                for content_hash, vector in rows:
+                    found[content_hash] = np.frombuffer(vector, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                with self._lock:
+                    self._touched.update((content_hash, now) for content_hash in found)
+                    flush = len(self._touched) >= self.touch_batch
+                if flush:
+                    self._write_touched(conn)
+                    conn.commit()
+        except Exception as e:
+            logger.warning(f"Error reading embedding cache: {e}")
+        finally:
+            conn.close()
+        vectors = {i: found[content_hash] for i, content_hash in enumerate(hashes) if content_hash in found}
+        self.hits += len(vectors)
+        self.misses += len(texts) - len(vectors)
+        metrics.CACHE_REQUESTS.inc(len(vectors), cache="embedding", result="hit")
+        metrics.CACHE_REQUESTS.inc(len(texts) - len(vectors), cache="embedding", result="miss")
+        return vectors
+
+    def put_many(self, texts: List[str], vectors):
+        now = time.time()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (content_hash, model, vector, last_used) VALUES (?, ?, ?, ?)",
+                [
+                    (chunk_codec.content_hash(text), self.model, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for text, vector in zip(texts, vectors)
+                ]
+            )
+            self._write_touched(conn)
+            with self._lock:
+                self._count += len(texts)
+                full = self._count > self.max_entries
+            if full:
+                self._evict(conn)
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"Error writing embedding cache: {e}")
+        finally:
+            conn.close()
+
+    def _write_touched(self, conn):
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            conn.executemany(
+                "UPDATE embeddings SET last_used = MAX(last_used, ?) WHERE content_hash = ? AND model = ?",
+                [(last_used, content_hash, self.model) for content_hash, last_used in touched.items()]
+            )
+
+    def _evict(self, conn):
+        count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - int(self.max_entries * 0.9) if count > self.max_entries else 0
+        if excess:
+            # Evict down to 90% of the limit so eviction does not run on every insert
+            conn.execute("""
+                DELETE FROM embeddings WHERE rowid IN (
+                    SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?
+                )
+            """, (excess,))
+            logger.info(f"Evicted {excess} least recently used embeddings from the cache")
+        with self._lock:
+            self._count = count - excess
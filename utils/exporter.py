@@ -0,0 +1,161 @@
+import csv
+import io
+import json
+import sqlite3
+import logging
+from typing import Iterator, List, Optional
+
+from . import chunk_codec
+
+logger = logging.getLogger(__name__)
+
+CHAT_HISTORY_FIELDS = ["id", "user_id", "question", "answer", "timestamp", "departement_id",
+                       "filiere_id", "module_id", "activite_id", "profile_id"]
+DOCUMENT_METADATA_FIELDS = ["id", "base_filename", "file_hash", "chunk_index", "chunk_text", "departement_id",
+                            "filiere_id", "module_id", "activite_id", "profile_id", "user_id", "date_Ingestion"]
+CHROMA_FIELDS = ["id", "document", "base_filename", "file_hash", "chunk_index", "departement_id",
+                 "filiere_id", "module_id", "activite_id", "profile_id", "user_id"]
+
+
+def role_scope(profile_id: int, user_id: int, departement_id=None, filiere_id=None) -> Optional[dict]:
+    """Rows a profile may export, as column -> value equalities (same rules as
+    FilterManager.get_chat_history). {} for admins; None when nothing may be exported."""
+    if profile_id == 1:  # Admin: everything
+        scope = {}
+    elif profile_id == 2:  # Teacher
+        scope = {"departement_id": departement_id, "filiere_id": filiere_id}
+    elif profile_id == 3:  # Student: own rows of their filiere
+        scope = {"filiere_id": filiere_id, "user_id": user_id}
+    else:
+        return None
+    # A missing id matches no row (column = NULL)
+    if any(value is None for value in scope.values()):
+        return None
+    return scope
+
+
+def _iter_table(db_path: str, table: str, fields: List[str], date_column: str, filiere_id=None, module_id=None,
+                date_from: Optional[str] = None, date_to: Optional[str] = None, page_size: int = 1000,
+                row_factory=dict, scope: Optional[dict] = None) -> Iterator[dict]:
+    """Keyset scan of a table in id order, one short-lived connection per page.
+
+    Only one page is held in memory, and no connection is kept open between
+    pages, so the generator can be consumed from any thread (StreamingResponse).
+    `scope` adds column = value conditions (see role_scope).
+    """
+    conditions = ["id > ?"]
+    params = []
+    for column, value in (scope or {}).items():
+        conditions.append(f"{column} = ?")
+        params.append(value)
+    if filiere_id is not None:
+        conditions.append("filiere_id = ?")
+        params.append(filiere_id)
+    if module_id is not None:
+        conditions.append("module_id = ?")
+        params.append(module_id)
+    if date_from:
+        conditions.append(f"{date_column} >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append(f"{date_column} < date(?, '+1 day')")
+        params.append(date_to)
+    query = f"SELECT {', '.join(fields)} FROM {table} WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?"
+
+    last_id = 0
+    while True:
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute(query, (last_id, *params, page_size)).fetchall()
+        finally:
+            conn.close()
+        if not rows:
+            return
+        for row in rows:
+            yield row_factory(row)
+        last_id = rows[-1]["id"]
+
+
+def iter_chat_history(db_path: str, filiere_id=None, module_id=None, date_from=None, date_to=None,
+                      page_size: int = 1000, scope: Optional[dict] = None) -> Iterator[dict]:
+    return _iter_table(db_path, "chat_history", CHAT_HISTORY_FIELDS, "timestamp",
+                       filiere_id, module_id, date_from, date_to, page_size, scope=scope)
+
+
+def iter_document_metadata(db_path: str, filiere_id=None, module_id=None, date_from=None, date_to=None,
+                           page_size: int = 1000, scope: Optional[dict] = None) -> Iterator[dict]:
+    codec = chunk_codec.ChunkCodec(db_path)
+
+    def document_metadata_row(row) -> dict:
+        # Decompress chunk_store text for rows written in "single" storage mode
+        row = dict(row)
+        data = row.pop("chunk_data")
+        if row["chunk_text"] is None and data is not None:
+            row["chunk_text"] = codec.decompress(data)
+        return row
+
+    fields = [f"dm.{field}" for field in DOCUMENT_METADATA_FIELDS] + ["cs.data AS chunk_data"]
+    return _iter_table(db_path, "document_metadata dm LEFT JOIN chunk_store cs ON cs.content_hash = dm.chunk_ref",
+                       fields, "date_Ingestion", filiere_id, module_id, date_from, date_to, page_size,
+                       row_factory=document_metadata_row, scope=scope)
+
+
+def iter_chroma_documents(collection, filiere_id=None, module_id=None, page_size: int = 500,
+                          text_loader=None, scope: Optional[dict] = None) -> Iterator[dict]:
+    """Page through a Chroma collection with limit/offset instead of a single collection.get().
+
+    `text_loader(ids)` supplies chunk texts that are not stored in Chroma
+    ("single" chunk storage mode), e.g. FilterManager.get_chunk_texts.
+    """
+    conditions = [{column: value} for column, value in (scope or {}).items()]
+    if filiere_id is not None:
+        conditions.append({"filiere_id": filiere_id})
+    if module_id is not None:
+        conditions.append({"module_id": module_id})
+    where = None
+    if len(conditions) == 1:
+        where = conditions[0]
+    elif conditions:
+        where = {"$and": conditions}
+
+    offset = 0
+    while True:
+        page = collection.get(where=where, limit=page_size, offset=offset, include=["documents", "metadatas"])
+        if not page["ids"]:
+            return
+        documents = page["documents"]
+        missing = [i for i, document in enumerate(documents) if document is None]
+        if missing and text_loader is not None:
+            documents = list(documents)
+            for i, text in zip(missing, text_loader([page["ids"][i] for i in missing])):
+                documents[i] = text
+        for chunk_id, document, metadata in zip(page["ids"], documents, page["metadatas"]):
+            yield {"id": chunk_id, "document": document, **(metadata or {})}
+        offset += len(page["ids"])
+
+
+def to_ndjson(rows: Iterator[dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def to_csv(rows: Iterator[dict], fields: List[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_rows(rows: Iterator[dict], fields: List[str], export_format: str = "ndjson") -> Iterator[str]:
+    if export_format == "ndjson":
+        return to_ndjson(rows)
+    if export_format == "csv":
+        return to_csv(rows, fields)
+    raise ValueError(f"Unsupported export format: {export_format}")
@@ -1,22 +1,31 @@
 import os
 import hashlib
 import json
-import PyPDF2
 from docx import Document
 from .EDA_Cleaner import TextPipeline, TextCleaner
+from . import pdf_extract
+from . import metrics
 import logging
 
 logger = logging.getLogger(__name__)
 
 class FileProcessor:
-    def __init__(self, chunk_size=850, chunk_overlap=130):
+    def __init__(self, chunk_size=850, chunk_overlap=130, pdf_workers=None, pdf_parallel_min_pages=None, clean=True):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        # TextPipeline cleaning (lowercase, punctuation, numbers, stopwords) before chunking
+        self.clean = clean
+        # PDFs with at least pdf_parallel_min_pages pages are extracted by pdf_workers processes
+        # (opt-in: on a single core the worker start-up costs more than it saves)
+        self.pdf_workers = pdf_workers or int(os.getenv("PDF_WORKERS", "1"))
+        self.pdf_parallel_min_pages = pdf_parallel_min_pages or int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
         self.processed_hashes = set()
+        self.text_pipeline = None
 
     def calculate_hash(self, content):
         return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
+    @metrics.timed(metrics.STAGE_SECONDS, stage="ingest_read")
     def read_file(self, file_path):
         file_extension = os.path.splitext(file_path)[1].lower()
         content = ""
@@ -25,10 +34,7 @@ class FileProcessor:
                 with open(file_path, 'r', encoding='utf-8') as file:
                     content = file.read()
             elif file_extension == '.pdf':
-                with open(file_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    for page in pdf_reader.pages:
-                        content += page.extract_text() + "\n"
+                content = pdf_extract.read_pdf(file_path, self.pdf_workers, self.pdf_parallel_min_pages)
             elif file_extension == '.docx':
                 doc = Document(file_path)
                 for para in doc.paragraphs:
@@ -43,6 +49,15 @@ class FileProcessor:
         except Exception as e:
             raise Exception(f"Erreur lors de la lecture du fichier {file_path} : {str(e)}")
 
+    @metrics.timed(metrics.STAGE_SECONDS, stage="ingest_clean")
+    def clean_text(self, content):
+        if not self.clean:
+            return content
+        if self.text_pipeline is None:
+            self.text_pipeline = TextPipeline(TextCleaner())
+        return self.text_pipeline.process(content)
+
+    @metrics.timed(metrics.STAGE_SECONDS, stage="ingest_chunk")
     def split_into_chunks(self, text):
         if not text:
             return []
@@ -79,9 +94,7 @@ class FileProcessor:
             self.processed_hashes.add(file_hash)
             
             # Clean the content
-            cleaner = TextCleaner()
-            pipeline = TextPipeline(cleaner)
-            cleaned_content = pipeline.process(content)
+            cleaned_content = self.clean_text(content)
             
             # Split into chunks
             chunks = self.split_into_chunks(cleaned_content)
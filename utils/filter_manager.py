@@ -1,8 +1,13 @@
 import sqlite3
 import hashlib
 from typing import Optional, List
-from api.models import ChatHistoryEntry # Assuming this model is defined elsewhere
 from datetime import datetime
+from utils.db_schema import ensure_schema, COUNTED_DIMENSIONS
+from utils.hierarchy_cache import get_hierarchy_cache
+from utils.chat_history_writer import get_chat_history_writer
+from utils import chunk_codec
+from utils import metrics
+from utils import tracing
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -11,10 +16,15 @@ logger = logging.getLogger(__name__)
 class FilterManager:
     def __init__(self, db_path: str):
         self.db_path = db_path
+        ensure_schema(db_path)
+        self.hierarchy_cache = get_hierarchy_cache(db_path)
+        self.chat_history_writer = get_chat_history_writer(db_path)
+        self.codec = chunk_codec.ChunkCodec(db_path)
 
     def hash_password(self, password: str) -> str:
         return hashlib.sha256(password.encode()).hexdigest()
 
+    @metrics.timed(metrics.DB_SECONDS, operation="authenticate")
     def authenticate(self, username: str, password: str) -> Optional[dict]:
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
@@ -58,36 +68,185 @@ class FilterManager:
             conn.commit()
             user_id = cursor.lastrowid
             conn.close()
+            self.hierarchy_cache.invalidate_user(user_id)
             return {"status": "success", "message": "User registered successfully.", "user_id": user_id}
         except Exception as e:
             logger.error(f"Error registering user: {e}")
             return {"status": "error", "message": str(e)}
 
+    @metrics.timed(metrics.DB_SECONDS, operation="save_chat_history")
+    @tracing.traced("db.save_chat_history")
     def save_chat_history(self, user_id, question, answer, departement_id, filiere_id, module_id, activite_id, profile_id):
+        # Batched by the background writer unless CHAT_HISTORY_WRITE_MODE=sync
+        self.chat_history_writer.submit(
+            (user_id, question, answer, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), departement_id, filiere_id, module_id, activite_id, profile_id)
+        )
+
+    def insert_metadata_sqlite(self, base_filename, file_hash, chunk_index, chunk_text, departement_id, filiere_id, module_id, activite_id, profile_id, user_id):
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         try:
             cursor.execute("""
-                INSERT INTO chat_history (user_id, question, answer, timestamp, departement_id, filiere_id, module_id, activite_id, profile_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (user_id, question, answer, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), departement_id, filiere_id, module_id, activite_id, profile_id))
+                INSERT INTO document_metadata (base_filename, file_hash, chunk_index, chunk_text, departement_id, filiere_id, module_id, activite_id, profile_id, user_id, date_Ingestion)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (base_filename, file_hash, chunk_index, chunk_text, departement_id, filiere_id, module_id, activite_id, profile_id, user_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
             conn.commit()
         except Exception as e:
-            logger.error(f"Error saving chat history: {e}")
+            logger.error(f"Error inserting metadata: {e}")
         finally:
             conn.close()
 
-    def insert_metadata_sqlite(self, base_filename, file_hash, chunk_index, chunk_text, departement_id, filiere_id, module_id, activite_id, profile_id, user_id):
+    def _update_document_counts(self, cursor, document: dict, delta: int):
+        cursor.execute("""
+            INSERT INTO document_counts (dimension, ref_id, count) VALUES ('total', 0, ?)
+            ON CONFLICT (dimension, ref_id) DO UPDATE SET count = count + excluded.count
+        """, (delta,))
+        for dimension in COUNTED_DIMENSIONS:
+            ref_id = document.get(f"{dimension}_id")
+            if ref_id is None:
+                continue
+            cursor.execute("""
+                INSERT INTO document_counts (dimension, ref_id, count) VALUES (?, ?, ?)
+                ON CONFLICT (dimension, ref_id) DO UPDATE SET count = count + excluded.count
+            """, (dimension, ref_id, delta))
+
+    def _remove_document(self, cursor, file_hash: str) -> int:
+        """Delete a document's chunks, summary row and counters; returns the number of chunk rows removed"""
+        cursor.execute("SELECT * FROM documents WHERE file_hash = ?", (file_hash,))
+        row = cursor.fetchone()
+        if row:
+            columns = [column[0] for column in cursor.description]
+            self._update_document_counts(cursor, dict(zip(columns, row)), -1)
+            cursor.execute("DELETE FROM documents WHERE file_hash = ?", (file_hash,))
+        cursor.execute("SELECT DISTINCT chunk_ref FROM document_metadata WHERE file_hash = ? AND chunk_ref IS NOT NULL", (file_hash,))
+        refs = [row[0] for row in cursor.fetchall()]
+        cursor.execute("DELETE FROM document_metadata WHERE file_hash = ?", (file_hash,))
+        deleted = cursor.rowcount
+        # Drop stored texts no other chunk references any more
+        cursor.executemany("""
+            DELETE FROM chunk_store
+            WHERE content_hash = ? AND NOT EXISTS (SELECT 1 FROM document_metadata WHERE chunk_ref = ?)
+        """, [(ref, ref) for ref in refs])
+        return deleted
+
+    def _journal_deletion(self, cursor, file_hash: str, chunk_count: Optional[int]):
+        cursor.execute(
+            "INSERT OR REPLACE INTO deletion_journal (file_hash, chunk_count, created_at) VALUES (?, ?, ?)",
+            (file_hash, chunk_count, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+
+    @metrics.timed(metrics.DB_SECONDS, operation="insert_document")
+    @tracing.traced("db.insert_document")
+    def insert_document(self, base_filename, file_hash, chunks, departement_id, filiere_id, module_id, activite_id, profile_id, user_id,
+                        store_text_inline=True, version=1, replaces=None, reused_chunks=0) -> bool:
+        """
+        Write all chunks of a document, its summary row and counters in one transaction (replaces a previous ingestion)
+
+        With store_text_inline=False the text goes to the compressed, content-addressed
+        chunk_store and document_metadata only keeps its chunk_ref.
+        `replaces` is the file_hash of the previous version of the document: it is removed in
+        the same transaction and journaled so its vectors can be deleted afterwards.
+        """
+        date_ingestion = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        document = {
+            "departement_id": departement_id,
+            "filiere_id": filiere_id,
+            "module_id": module_id,
+            "activite_id": activite_id
+        }
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         try:
+            self._remove_document(cursor, file_hash)
+            if replaces and replaces != file_hash:
+                cursor.execute("SELECT chunk_count FROM documents WHERE file_hash = ?", (replaces,))
+                row = cursor.fetchone()
+                self._remove_document(cursor, replaces)
+                self._journal_deletion(cursor, replaces, row[0] if row else None)
+            hashes = [chunk_codec.content_hash(chunk) for chunk in chunks]
+            refs = [None] * len(chunks)
+            if not store_text_inline:
+                refs = hashes
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO chunk_store (content_hash, data, size) VALUES (?, ?, ?)",
+                    [(ref, self.codec.compress(chunk), len(chunk)) for ref, chunk in zip(refs, chunks)]
+                )
+            cursor.executemany("""
+                INSERT INTO document_metadata (base_filename, file_hash, chunk_index, chunk_text, chunk_ref, chunk_hash, departement_id, filiere_id, module_id, activite_id, profile_id, user_id, date_Ingestion)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (base_filename, file_hash, i, chunk if store_text_inline else None, ref, chunk_hash, departement_id, filiere_id, module_id, activite_id, profile_id, user_id, date_ingestion)
+                for i, (chunk, ref, chunk_hash) in enumerate(zip(chunks, refs, hashes))
+            ])
             cursor.execute("""
-                INSERT INTO document_metadata (base_filename, file_hash, chunk_index, chunk_text, departement_id, filiere_id, module_id, activite_id, profile_id, user_id, date_Ingestion)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (base_filename, file_hash, chunk_index, chunk_text, departement_id, filiere_id, module_id, activite_id, profile_id, user_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+                INSERT INTO documents (file_hash, base_filename, chunk_count, total_size, departement_id, filiere_id, module_id, activite_id, profile_id, user_id, date_Ingestion, version)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (file_hash, base_filename, len(chunks), sum(len(chunk) for chunk in chunks), departement_id, filiere_id, module_id, activite_id, profile_id, user_id, date_ingestion, version))
+            # Re-ingesting an unchanged file keeps its version: no second row for it
+            cursor.execute("""
+                INSERT INTO document_versions (base_filename, departement_id, filiere_id, module_id, activite_id, profile_id, user_id, version, file_hash, previous_hash, chunk_count, reused_chunks, date_Ingestion)
+                SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM document_versions
+                    WHERE base_filename = ? AND departement_id = ? AND filiere_id = ? AND module_id = ? AND activite_id = ?
+                        AND profile_id = ? AND user_id = ? AND version = ? AND file_hash = ?
+                )
+            """, (base_filename, departement_id, filiere_id, module_id, activite_id, profile_id, user_id, version, file_hash, replaces, len(chunks), reused_chunks, date_ingestion,
+                  base_filename, departement_id, filiere_id, module_id, activite_id, profile_id, user_id, version, file_hash))
+            self._update_document_counts(cursor, document, 1)
             conn.commit()
+            return True
         except Exception as e:
-            logger.error(f"Error inserting metadata: {e}")
+            conn.rollback()
+            logger.error(f"Error inserting document {file_hash}: {e}")
+            return False
+        finally:
+            conn.close()
+
+    def find_document(self, base_filename, departement_id, filiere_id, module_id, activite_id, profile_id, user_id) -> Optional[dict]:
+        """Current version of a document identified by its filename and scope"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT file_hash, version, chunk_count
+                FROM documents
+                WHERE base_filename = ? AND departement_id IS ? AND filiere_id IS ? AND module_id IS ?
+                      AND activite_id IS ? AND profile_id IS ? AND user_id IS ?
+                ORDER BY date_Ingestion DESC
+                LIMIT 1
+            """, (base_filename, departement_id, filiere_id, module_id, activite_id, profile_id, user_id))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return {"file_hash": row[0], "version": row[1] or 1, "chunk_count": row[2]}
+        except Exception as e:
+            logger.error(f"Error finding document {base_filename}: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def get_chunk_hashes(self, file_hash: str) -> dict:
+        """Content hash -> chunk_index for the chunks of a document (hashed from the text for older rows)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT chunk_index, COALESCE(chunk_hash, chunk_ref), chunk_text
+                FROM document_metadata
+                WHERE file_hash = ?
+                ORDER BY chunk_index
+            """, (file_hash,))
+            hashes = {}
+            for chunk_index, chunk_hash, chunk_text in cursor.fetchall():
+                if chunk_hash is None and chunk_text is not None:
+                    chunk_hash = chunk_codec.content_hash(chunk_text)
+                if chunk_hash is not None:
+                    hashes.setdefault(chunk_hash, chunk_index)
+            return hashes
+        except Exception as e:
+            logger.error(f"Error getting chunk hashes for document {file_hash}: {e}")
+            return {}
         finally:
             conn.close()
 
@@ -108,6 +267,61 @@ class FilterManager:
         finally:
             conn.close()
 
+    def _chunk_text(self, chunk_text, data):
+        """Inline chunk_text, or the decompressed chunk_store blob it references (zlib or zstd)"""
+        if chunk_text is not None:
+            return chunk_text
+        return self.codec.decompress(data) if data is not None else None
+
+    @metrics.timed(metrics.DB_SECONDS, operation="get_chunk_texts")
+    @tracing.traced("db.get_chunk_texts")
+    def get_chunk_texts(self, ids: List[str]) -> List[Optional[str]]:
+        """Return chunk texts for Chroma-style ids ('{file_hash}_{chunk_index}'), in the same order"""
+        wanted = {}
+        for chunk_id in ids:
+            file_hash, _, chunk_index = chunk_id.rpartition("_")
+            wanted.setdefault(file_hash, set()).add(int(chunk_index))
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        texts = {}
+        try:
+            for file_hash, indexes in wanted.items():
+                placeholders = ", ".join("?" * len(indexes))
+                cursor.execute(f"""
+                    SELECT dm.chunk_index, dm.chunk_text, cs.data
+                    FROM document_metadata dm
+                    LEFT JOIN chunk_store cs ON cs.content_hash = dm.chunk_ref
+                    WHERE dm.file_hash = ? AND dm.chunk_index IN ({placeholders})
+                """, (file_hash, *indexes))
+                for chunk_index, chunk_text, data in cursor.fetchall():
+                    texts[f"{file_hash}_{chunk_index}"] = self._chunk_text(chunk_text, data)
+        except Exception as e:
+            logger.error(f"Error getting chunk texts: {e}")
+        finally:
+            conn.close()
+        return [texts.get(chunk_id) for chunk_id in ids]
+
+    def get_document_chunks(self, file_hash: str) -> List[str]:
+        """All chunk texts of a document in chunk_index order"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT dm.chunk_text, cs.data
+                FROM document_metadata dm
+                LEFT JOIN chunk_store cs ON cs.content_hash = dm.chunk_ref
+                WHERE dm.file_hash = ?
+                GROUP BY dm.chunk_index
+                ORDER BY dm.chunk_index
+            """, (file_hash,))
+            texts = [self._chunk_text(chunk_text, data) for chunk_text, data in cursor.fetchall()]
+            return [text for text in texts if text is not None]
+        except Exception as e:
+            logger.error(f"Error getting chunks for document {file_hash}: {e}")
+            return []
+        finally:
+            conn.close()
+
     # def get_documents_ingested(self):
     #     conn = sqlite3.connect(self.db_path)
     #     cursor = conn.cursor()
@@ -160,21 +374,20 @@ class FilterManager:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         try:
+            # Served from the one-row-per-document summary table instead of aggregating every chunk
             cursor.execute("""
-                SELECT DISTINCT dm.base_filename, dm.file_hash, dm.user_id, dm.date_Ingestion,
-                    dm.departement_id, dm.filiere_id, dm.module_id, dm.activite_id, dm.profile_id,
+                SELECT doc.base_filename, doc.file_hash, doc.user_id, doc.date_Ingestion,
+                    doc.departement_id, doc.filiere_id, doc.module_id, doc.activite_id, doc.profile_id,
                     d.nom as departement_name, f.nom as filiere_name, m.nom as module_name, 
                     a.nom as activite_name, p.nom as profile_name,
-                    COUNT(dm.chunk_index) as chunk_count,
-                    SUM(LENGTH(dm.chunk_text)) as total_size
-                FROM document_metadata dm
-                LEFT JOIN departements d ON dm.departement_id = d.id
-                LEFT JOIN filieres f ON dm.filiere_id = f.id
-                LEFT JOIN modules m ON dm.module_id = m.id
-                LEFT JOIN activites a ON dm.activite_id = a.id
-                LEFT JOIN profile p ON dm.profile_id = p.id
-                GROUP BY dm.file_hash
-                ORDER BY dm.date_Ingestion DESC
+                    doc.chunk_count, doc.total_size
+                FROM documents doc
+                LEFT JOIN departements d ON doc.departement_id = d.id
+                LEFT JOIN filieres f ON doc.filiere_id = f.id
+                LEFT JOIN modules m ON doc.module_id = m.id
+                LEFT JOIN activites a ON doc.activite_id = a.id
+                LEFT JOIN profile p ON doc.profile_id = p.id
+                ORDER BY doc.date_Ingestion DESC
             """)
             rows = cursor.fetchall()
             
@@ -208,40 +421,25 @@ class FilterManager:
             conn.close()
 
     def get_ingestion_statistics(self):
+        """Document counts per scope, read from the counters maintained at ingestion/deletion time"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         stats = {}
         try:
-            cursor.execute("SELECT COUNT(DISTINCT file_hash) FROM document_metadata")
-            stats["total_documents"] = cursor.fetchone()[0]
-            cursor.execute("""
-                SELECT d.nom, COUNT(DISTINCT dm.file_hash)
-                FROM document_metadata dm
-                JOIN departements d ON dm.departement_id = d.id
-                GROUP BY d.nom
-            """)
-            stats["documents_par_departement"] = [{"departement": row[0], "count": row[1]} for row in cursor.fetchall()]
-            cursor.execute("""
-                SELECT f.nom, COUNT(DISTINCT dm.file_hash)
-                FROM document_metadata dm
-                JOIN filieres f ON dm.filiere_id = f.id
-                GROUP BY f.nom
-            """)
-            stats["documents_par_filiere"] = [{"filiere": row[0], "count": row[1]} for row in cursor.fetchall()]
-            cursor.execute("""
-                SELECT m.nom, COUNT(DISTINCT dm.file_hash)
-                FROM document_metadata dm
-                JOIN modules m ON dm.module_id = m.id
-                GROUP BY m.nom
-            """)
-            stats["documents_par_module"] = [{"module": row[0], "count": row[1]} for row in cursor.fetchall()]
-            cursor.execute("""
-                SELECT a.nom, COUNT(DISTINCT dm.file_hash)
-                FROM document_metadata dm
-                JOIN activites a ON dm.activite_id = a.id
-                GROUP BY a.nom
-            """)
-            stats["documents_par_activite"] = [{"activite": row[0], "count": row[1]} for row in cursor.fetchall()]
+            cursor.execute("SELECT count FROM document_counts WHERE dimension = 'total'")
+            row = cursor.fetchone()
+            stats["total_documents"] = row[0] if row else 0
+            tables = {"departement": "departements", "filiere": "filieres", "module": "modules", "activite": "activites"}
+            for dimension, table in tables.items():
+                cursor.execute(f"""
+                    SELECT t.nom, SUM(c.count)
+                    FROM document_counts c
+                    JOIN {table} t ON c.ref_id = t.id
+                    WHERE c.dimension = ?
+                    GROUP BY t.nom
+                    HAVING SUM(c.count) > 0
+                """, (dimension,))
+                stats[f"documents_par_{dimension}"] = [{dimension: row[0], "count": row[1]} for row in cursor.fetchall()]
             return stats
         except Exception as e:
             logger.error(f"Error getting ingestion statistics: {e}")
@@ -249,11 +447,27 @@ class FilterManager:
         finally:
             conn.close()
 
-    def get_chat_history(self, profile_id: int, user_id: int, departement_id: Optional[int] = None, filiere_id: Optional[int] = None) -> List[ChatHistoryEntry]:
+    @metrics.timed(metrics.DB_SECONDS, operation="get_chat_history")
+    @tracing.traced("db.get_chat_history")
+    def get_chat_history(self, profile_id: int, user_id: int, departement_id: Optional[int] = None, filiere_id: Optional[int] = None,
+                         limit: int = 50, before_id: Optional[int] = None, date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[dict]:
+        """
+        One page of chat history, newest first.
+
+        Keyset pagination: pass the smallest `id` of the previous page as `before_id`
+        to get the next one. `date_from` / `date_to` are inclusive YYYY-MM-DD dates.
+        Timestamps are formatted by SQLite as DD/MM/YYYY HH:MM:SS.
+        """
+        # Rows still queued by the write-behind writer
+        self.chat_history_writer.flush()
         conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         try:
-            query = "SELECT user_id, question, answer, timestamp FROM chat_history"
+            query = """
+                SELECT id, user_id, question, answer, strftime('%d/%m/%Y %H:%M:%S', timestamp) AS timestamp
+                FROM chat_history
+            """
             conditions = []
             params = []
             if profile_id == 1:
@@ -269,23 +483,24 @@ class FilterManager:
                 conditions.append("user_id = ?") # Students only see their own history
                 params.append(user_id)
             else:
-                conn.close()
                 return []
 
+            if before_id is not None:
+                conditions.append("id < ?")
+                params.append(before_id)
+            if date_from:
+                conditions.append("timestamp >= ?")
+                params.append(date_from)
+            if date_to:
+                conditions.append("timestamp < date(?, '+1 day')")
+                params.append(date_to)
+
             if conditions:
                 query += " WHERE " + " AND ".join(conditions)
-            query += " ORDER BY timestamp DESC"
+            query += " ORDER BY id DESC LIMIT ?"
+            params.append(limit)
             cursor.execute(query, params)
-            rows = cursor.fetchall()
-            return [
-                ChatHistoryEntry(
-                    user_id=row[0],
-                    question=row[1],
-                    answer=row[2],
-                    timestamp=datetime.strptime(row[3], "%Y-%m-%d %H:%M:%S").strftime("%d/%m/%Y %H:%M:%S") # Added time to format
-                )
-                for row in rows
-            ]
+            return [dict(row) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Error getting chat history: {e}")
             return []
@@ -355,6 +570,14 @@ class FilterManager:
         finally:
             conn.close()
 
+    def get_cached_user(self, user_id: int) -> Optional[dict]:
+        """Same as get_user_by_id, served from the in-memory cache after the first call"""
+        return self.hierarchy_cache.get_user(user_id, self.get_user_by_id)
+
+    def resolve_context(self, filiere_id, departement_id=None, module_id=None, activite_id=None) -> dict:
+        """Fill missing departement/module/activite ids for a filiere from the cached hierarchy"""
+        return self.hierarchy_cache.resolve_context(filiere_id, departement_id, module_id, activite_id)
+
     def update_user(self, user_id: int, data) -> dict:
         """Update a user"""
         try:
@@ -409,6 +632,7 @@ class FilterManager:
             cursor.execute(query, params)
             conn.commit()
             conn.close()
+            self.hierarchy_cache.invalidate_user(user_id)
 
             return {"status": "success", "message": "User updated successfully."}
 
@@ -433,6 +657,7 @@ class FilterManager:
             conn.commit()
             affected_rows = cursor.rowcount
             conn.close()
+            self.hierarchy_cache.invalidate_user(user_id)
 
             if affected_rows > 0:
                 return {"status": "success", "message": "User deleted successfully."}
@@ -492,24 +717,88 @@ class FilterManager:
         finally:
             conn.close()
     
+    @metrics.timed(metrics.DB_SECONDS, operation="delete_documents")
+    @tracing.traced("db.delete_documents")
+    def delete_documents(self, file_hashes: List[str]) -> dict:
+        """
+        Delete several documents from SQLite in one transaction and journal them.
+
+        The journal entries (file_hash, chunk_count) are written in the same
+        transaction and stay until clear_deletion_journal is called once the
+        vectors are gone as well, so an interrupted deletion can be replayed.
+
+        Returns:
+            dict file_hash -> number of chunk rows deleted (0 if unknown)
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        deleted = {}
+        try:
+            for file_hash in dict.fromkeys(file_hashes):
+                cursor.execute("SELECT chunk_count FROM documents WHERE file_hash = ?", (file_hash,))
+                row = cursor.fetchone()
+                deleted[file_hash] = self._remove_document(cursor, file_hash)
+                self._journal_deletion(cursor, file_hash, row[0] if row else None)
+            conn.commit()
+            return deleted
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error deleting documents {file_hashes}: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def get_pending_deletions(self) -> dict:
+        """Journaled deletions not yet applied to the vector stores: file_hash -> chunk_count (None if unknown)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT file_hash, chunk_count FROM deletion_journal ORDER BY created_at")
+            return dict(cursor.fetchall())
+        except Exception as e:
+            logger.error(f"Error reading deletion journal: {e}")
+            return {}
+        finally:
+            conn.close()
+
+    def clear_deletion_journal(self, file_hashes: List[str]):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.executemany("DELETE FROM deletion_journal WHERE file_hash = ?", [(file_hash,) for file_hash in file_hashes])
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error clearing deletion journal: {e}")
+        finally:
+            conn.close()
+
+    def get_document_chunk_count(self, file_hash: str) -> Optional[int]:
+        """Chunk count from the documents summary table, None if the document is unknown"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT chunk_count FROM documents WHERE file_hash = ?", (file_hash,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            logger.error(f"Error getting chunk count for document {file_hash}: {e}")
+            return None
+        finally:
+            conn.close()
+
     def delete_document_by_hash(self, file_hash: str) -> dict:
         """Delete a document and all its chunks from both SQLite and potentially ChromaDB"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            # Check if document exists
-            cursor.execute("SELECT COUNT(*) FROM document_metadata WHERE file_hash = ?", (file_hash,))
-            count = cursor.fetchone()[0]
+            # Delete chunks, summary row and counters in one transaction
+            deleted_count = self._remove_document(cursor, file_hash)
             
-            if count == 0:
+            if deleted_count == 0:
+                conn.rollback()
                 conn.close()
                 return {"status": "error", "message": "Document not found in database"}
             
-            # Delete from document_metadata
-            cursor.execute("DELETE FROM document_metadata WHERE file_hash = ?", (file_hash,))
-            deleted_count = cursor.rowcount
-            
             conn.commit()
             conn.close()
             
@@ -522,4 +811,3 @@ class FilterManager:
         except Exception as e:
             logger.error(f"Error deleting document {file_hash}: {e}")
             return {"status": "error", "message": str(e)}
-
@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCOPE_FIELDS = ("departement_id", "filiere_id", "module_id", "activite_id", "profile_id", "user_id")
+SUPPORTED_EXTENSIONS = (".txt", ".pdf", ".docx", ".json")
+SIDECAR_SUFFIX = ".meta.json"
+SCOPE_FILE = "scope.json"
+
+
+def file_sha256(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+class FolderWatcher:
+    """Keeps a directory tree in sync with the index by polling.
+
+    Each file's scope is resolved, by increasing precedence, from:
+      - `defaults` (e.g. profile_id/user_id given on the command line)
+      - numeric directory names under the root, in order:
+        <root>/<departement_id>/<filiere_id>/<module_id>/<activite_id>/file.pdf
+      - `scope.json` files in the root and each directory down to the file
+      - a `<file>.meta.json` sidecar next to the file
+
+    A file is only hashed when its mtime or size changed since the last scan,
+    and only ingested when its content hash changed too. Files that disappear
+    are deleted from the index. The state (mtime, size, sha256, scope and the
+    indexed document hash) is saved to `state_path` after every batch, so a
+    restart resumes without rescanning unchanged files.
+    """
+
+    def __init__(self, chatbot, root: str, state_path: str = "./bdd/watch_state.json",
+                 defaults: Optional[dict] = None, batch_size: int = 8, settle_seconds: float = 2.0):
+        self.chatbot = chatbot
+        self.root = os.path.abspath(root)
+        self.state_path = state_path
+        self.defaults = {key: value for key, value in (defaults or {}).items() if value is not None}
+        self.batch_size = batch_size
+        self.settle_seconds = settle_seconds
+        self.state = self._load_state()
+
+    def _load_state(self) -> Dict[str, dict]:
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("files", {})
+
+    def _save_state(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"root": self.root, "files": self.state}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.state_path)
+
+    @staticmethod
+    def _read_json(path: str) -> dict:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable scope file {path}: {e}")
+            return {}
+        if not isinstance(data, dict):
+            logger.warning(f"Ignoring scope file {path}: not a JSON object")
+            return {}
+        return data
+
+    def resolve_scope(self, path: str) -> Optional[dict]:
+        scope = dict(self.defaults)
+        relative_dir = os.path.relpath(os.path.dirname(path), self.root)
+        parts = [] if relative_dir == "." else relative_dir.split(os.sep)
+        for field, part in zip(SCOPE_FIELDS[:4], parts):
+            if part.isdigit():
+                scope[field] = int(part)
+
+        directory = self.root
+        for part in [""] + parts:
+            directory = os.path.join(directory, part) if part else directory
+            scope_file = os.path.join(directory, SCOPE_FILE)
+            if os.path.exists(scope_file):
+                scope.update(self._read_json(scope_file))
+        sidecar = path + SIDECAR_SUFFIX
+        if os.path.exists(sidecar):
+            scope.update(self._read_json(sidecar))
+
+        resolved = {}
+        for field in SCOPE_FIELDS:
+            value = scope.get(field)
+            if value is None:
+                return None
+            # A bad value in one scope.json must not abort the whole scan
+            try:
+                resolved[field] = int(value)
+            except (TypeError, ValueError):
+                logger.warning(f"Invalid {field} {value!r} in the scope of {path}")
+                return None
+        return resolved
+
+    def _candidate_files(self) -> Dict[str, os.stat_result]:
+        files = {}
+        for directory, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+            for name in filenames:
+                if name.startswith(".") or name.endswith(SIDECAR_SUFFIX) or name == SCOPE_FILE:
+                    continue
+                if os.path.splitext(name)[1].lower() not in SUPPORTED_EXTENSIONS:
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    files[os.path.relpath(path, self.root)] = os.stat(path)
+                except FileNotFoundError:
+                    continue
+        return files
+
+    def scan(self) -> dict:
+        """One synchronisation pass; returns counts of ingested, unchanged, removed, skipped and failed files"""
+        summary = {"ingested": 0, "unchanged": 0, "removed": 0, "skipped": 0, "failed": 0}
+        files = self._candidate_files()
+        now = time.time()
+        pending = []
+
+        for relative_path, stat in sorted(files.items()):
+            entry = self.state.get(relative_path)
+            if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                summary["unchanged"] += 1
+                continue
+            if now - stat.st_mtime < self.settle_seconds:
+                # Possibly still being written; picked up by the next scan
+                summary["skipped"] += 1
+                continue
+            path = os.path.join(self.root, relative_path)
+            scope = self.resolve_scope(path)
+            if scope is None:
+                logger.warning(f"No complete scope for {relative_path}, skipped (add a {SCOPE_FILE} or {SIDECAR_SUFFIX} sidecar)")
+                summary["skipped"] += 1
+                continue
+            sha256 = file_sha256(path)
+            if entry and entry["sha256"] == sha256 and entry["scope"] == scope and not entry.get("error"):
+                entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                summary["unchanged"] += 1
+                continue
+            pending.append((relative_path, stat, sha256, scope))
+
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            self._ingest_batch(batch, summary)
+            self._save_state()
+
+        removed = [relative_path for relative_path in self.state if relative_path not in files]
+        if removed:
+            # A moved file keeps its document hash under the new path; only orphaned documents are deleted
+            kept = {entry.get("file_hash") for relative_path, entry in self.state.items() if relative_path in files}
+            file_hashes = {self.state[relative_path].get("file_hash") for relative_path in removed} - kept - {None}
+            if file_hashes:
+                self.chatbot.delete_documents(sorted(file_hashes))
+            for relative_path in removed:
+                logger.info(f"Removed from the index: {relative_path}")
+                del self.state[relative_path]
+            summary["removed"] = len(removed)
+        self._save_state()
+        return summary
+
+    def _ingest_batch(self, batch: List[tuple], summary: dict):
+        jobs = [{
+            "base_filename": os.path.basename(relative_path),
+            "file_path": os.path.join(self.root, relative_path),
+            **scope
+        } for relative_path, _, _, scope in batch]
+        results = self.chatbot.ingest_files(jobs)
+
+        for (relative_path, stat, sha256, scope), job, result in zip(batch, jobs, results):
+            previous = self.state.get(relative_path)
+            entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha256, "scope": scope}
+            if result["status"] == "success":
+                document = self.chatbot.filter_manager.find_document(
+                    job["base_filename"], *(scope[field] for field in SCOPE_FIELDS)
+                )
+                entry["file_hash"] = document["file_hash"] if document else None
+                summary["ingested"] += 1
+                logger.info(f"Ingested {relative_path}: {result['message']}")
+                # Moved to another scope: the copy indexed under the old scope goes away
+                if previous and previous.get("file_hash") and previous["scope"] != scope \
+                        and previous["file_hash"] != entry["file_hash"]:
+                    self.chatbot.delete_documents([previous["file_hash"]])
+            else:
+                # Recorded so an unchanged failing file is not retried on every scan
+                entry["file_hash"] = previous.get("file_hash") if previous else None
+                entry["error"] = result["message"]
+                summary["failed"] += 1
+                logger.error(f"Failed to ingest {relative_path}: {result['message']}")
+            self.state[relative_path] = entry
+
+    def run(self, interval: float = 30.0):
+        logger.info(f"Watching {self.root} every {interval}s")
+        while True:
+            try:
+                summary = self.scan()
+                if any(summary[key] for key in ("ingested", "removed", "failed")):
+                    logger.info(f"Sync of {self.root}: {summary}")
+            except Exception as e:
+                logger.error(f"Error syncing {self.root}: {e}")
+            time.sleep(interval)
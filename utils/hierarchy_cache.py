@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import threading
+import logging
+from typing import Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class HierarchyCache:
+    """In-memory copy of the departement/filiere/module/activite hierarchy and user profiles.
+
+    Readers get an immutable snapshot; write methods of ResourceManager and
+    FilterManager bump `version` (or drop one user) and the next read rebuilds
+    the snapshot, so context resolution is a dictionary lookup.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.version = 0
+        self._snapshot = None
+        self._snapshot_version = -1
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+
+    def invalidate_user(self, user_id: Optional[int] = None):
+        with self._lock:
+            if user_id is None:
+                self._users = {}
+            else:
+                self._users.pop(user_id, None)
+
+    def _load(self) -> dict:
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id, departement_id FROM filieres")
+            filiere_departement = dict(cursor.fetchall())
+            # Same rows the former "LIMIT 1" queries returned: the first id per parent
+            cursor.execute("SELECT filiere_id, MIN(id) FROM modules GROUP BY filiere_id")
+            first_module = dict(cursor.fetchall())
+            cursor.execute("SELECT module_id, MIN(id) FROM activites GROUP BY module_id")
+            first_activite = dict(cursor.fetchall())
+        finally:
+            conn.close()
+        return {
+            "filiere_departement": filiere_departement,
+            "first_module": first_module,
+            "first_activite": first_activite
+        }
+
+    def snapshot(self) -> dict:
+        snapshot = self._snapshot
+        if snapshot is not None and self._snapshot_version == self.version:
+            metrics.CACHE_REQUESTS.inc(cache="hierarchy", result="hit")
+            return snapshot
+        metrics.CACHE_REQUESTS.inc(cache="hierarchy", result="miss")
+        with self._lock:
+            if self._snapshot is None or self._snapshot_version != self.version:
+                version = self.version
+                self._snapshot = self._load()
+                self._snapshot_version = version
+            return self._snapshot
+
+    def resolve_context(self, filiere_id, departement_id=None, module_id=None, activite_id=None) -> dict:
+        """Fill missing departement/module/activite ids from the filiere, keeping the given ones."""
+        snapshot = self.snapshot()
+        departement_id = departement_id or snapshot["filiere_departement"].get(filiere_id)
+        if filiere_id:
+            module_id = module_id or snapshot["first_module"].get(filiere_id)
+        if module_id:
+            activite_id = activite_id or snapshot["first_activite"].get(module_id)
+        return {
+            "departement_id": departement_id,
+            "module_id": module_id,
+            "activite_id": activite_id
+        }
+
+    def get_user(self, user_id: int, loader) -> Optional[dict]:
+        """Return a cached user profile, calling `loader(user_id)` on a miss."""
+        user = self._users.get(user_id)
+        metrics.CACHE_REQUESTS.inc(cache="user", result="miss" if user is None else "hit")
+        if user is None:
+            user = loader(user_id)
+            if user is not None:
+                with self._lock:
+                    self._users[user_id] = user
+        return dict(user) if user else None
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_hierarchy_cache(db_path: str) -> HierarchyCache:
+    """Process-wide cache shared by every manager pointing at the same database."""
+    key = os.path.abspath(db_path)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = HierarchyCache(db_path)
+        return _caches[key]
@@ -0,0 +1,148 @@
+import time
+import queue
+import threading
+import logging
+import contextvars
+from typing import Callable, Dict, Iterable, List
+
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class Stage:
+    """One pipeline step: `fn(job) -> job`, run by `workers` threads.
+
+    An `exclusive` stage runs one job at a time across all concurrent runs of
+    the pipeline (e.g. the single writer), whatever its worker count.
+    """
+
+    def __init__(self, name: str, fn: Callable[[dict], dict], workers: int = 1, exclusive: bool = False):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.lock = threading.Lock() if exclusive else None
+
+
+class IngestionPipeline:
+    """Runs jobs through stages connected by bounded queues.
+
+    Each job is a dict passed from stage to stage. A full queue blocks the
+    upstream stage (backpressure), so at most `queue_size` jobs wait between
+    two stages. A stage that raises, or sets job["result"] itself, short-circuits
+    the job: later stages pass it through untouched. Jobs come back in input order.
+
+    Per-stage metrics are accumulated across runs:
+        busy_seconds     time spent in the stage function
+        blocked_seconds  time waiting for room in the next queue (downstream is the bottleneck)
+        idle_seconds     time waiting for input (upstream is the bottleneck)
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 4):
+        self.stages = stages
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self.metrics = {
+            stage.name: {"jobs": 0, "chunks": 0, "errors": 0, "busy_seconds": 0.0,
+                         "blocked_seconds": 0.0, "idle_seconds": 0.0}
+            for stage in stages
+        }
+
+    def _record(self, name: str, **values):
+        with self._lock:
+            for key, value in values.items():
+                self.metrics[name][key] += value
+
+    def _worker(self, stage: Stage, inbox: queue.Queue, outbox: queue.Queue, remaining: list, next_workers: int):
+        while True:
+            waited = time.perf_counter()
+            item = inbox.get()
+            idle = time.perf_counter() - waited
+            if item is _DONE:
+                self._record(stage.name, idle_seconds=idle)
+                break
+            index, job, context = item
+            started = time.perf_counter()
+            errors = 0
+            if "result" not in job:
+                try:
+                    job = context.run(self._run_stage, stage, job)
+                except Exception as e:
+                    errors = 1
+                    logger.error(f"Ingestion stage {stage.name} failed for {job.get('file_path')}: {e}")
+                    job["result"] = {"status": "error", "message": f"Error indexing file {job.get('file_path')}: {str(e)}"}
+            busy = time.perf_counter() - started
+            waited = time.perf_counter()
+            outbox.put((index, job, context))
+            self._record(stage.name, jobs=1, chunks=len(job.get("chunks") or ()), errors=errors, busy_seconds=busy,
+                         blocked_seconds=time.perf_counter() - waited, idle_seconds=idle)
+        # The last worker of a stage closes the next queue for every downstream worker
+        with self._lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            for _ in range(next_workers):
+                outbox.put(_DONE)
+
+    @staticmethod
+    def _run_stage(stage: Stage, job: dict) -> dict:
+        with tracing.span(f"ingest.{stage.name}", file_path=str(job.get("file_path"))):
+            if stage.lock is None:
+                return stage.fn(job)
+            with stage.lock:
+                return stage.fn(job)
+
+    def run(self, jobs: Iterable[dict]) -> List[dict]:
+        # Each job runs its stages in a copy of the caller's context (trace spans)
+        caller_context = contextvars.copy_context()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        output = queue.Queue()
+        threads = []
+        for position, stage in enumerate(self.stages):
+            last_stage = position == len(self.stages) - 1
+            outbox = output if last_stage else queues[position + 1]
+            next_workers = 1 if last_stage else self.stages[position + 1].workers
+            remaining = [stage.workers]
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker, args=(stage, queues[position], outbox, remaining, next_workers),
+                    name=f"ingest-{stage.name}-{n}", daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        def feed():
+            try:
+                for index, job in enumerate(jobs):
+                    queues[0].put((index, job, caller_context.copy()))
+            except Exception as e:
+                logger.error(f"Error reading ingestion jobs: {e}")
+            finally:
+                for _ in range(self.stages[0].workers):
+                    queues[0].put(_DONE)
+
+        feeder = threading.Thread(target=feed, name="ingest-feeder", daemon=True)
+        feeder.start()
+
+        results = {}
+        while True:
+            item = output.get()
+            if item is _DONE:
+                break
+            index, job, _ = item
+            results[index] = job
+        feeder.join()
+        for thread in threads:
+            thread.join()
+        return [results[index] for index in sorted(results)]
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            stats = {name: dict(values) for name, values in self.metrics.items()}
+        for values in stats.values():
+            busy = values["busy_seconds"]
+            values["jobs_per_second"] = values["jobs"] / busy if busy else None
+            values["chunks_per_second"] = values["chunks"] / busy if busy else None
+        return stats
@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+
+from . import tracing
+
+# Process-wide logging: records are put on a queue by the request thread and
+# formatted and written by a listener thread, so a slow stderr or log file
+# never stalls a request.
+#   LOG_LEVEL                default INFO
+#   LOG_FORMAT               "text" (default) or "json" (one object per line)
+#   LOG_MAX_FIELD_CHARS      cap on each logged field / message (default 500)
+#   LOG_PAYLOAD_SAMPLE_RATE  fraction of requests whose prompt, context and LLM
+#                            response are logged in full (default 0; always
+#                            logged when LOG_LEVEL=DEBUG)
+
+MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "500"))
+PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0"))
+# Hard cap on any single record, sampled payloads included
+MAX_MESSAGE_CHARS = MAX_FIELD_CHARS * 20
+
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+_listener = None
+
+
+def truncate(value, limit: int = None) -> str:
+    text = value if isinstance(value, str) else str(value)
+    limit = MAX_FIELD_CHARS if limit is None else limit
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+class _CappedFormatter(logging.Formatter):
+    """Used by the queue handler, in the caller's thread: caps the message before it is queued"""
+
+    def format(self, record):
+        message = truncate(record.getMessage(), MAX_MESSAGE_CHARS)
+        if record.exc_info:
+            message = f"{message}\n{self.formatException(record.exc_info)}"
+        return message
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _TraceFilter(logging.Filter):
+    """Adds the current trace id (if the request is traced) while still in the request's context"""
+
+    def filter(self, record):
+        traceparent = tracing.current_traceparent()
+        if traceparent:
+            record.trace_id = traceparent.split("-")[1]
+        return True
+
+
+def configure_logging(level: str = None, fmt: str = None, stream=None):
+    """Route the root logger through a queue; replaces handlers installed by logging.basicConfig"""
+    global _listener
+    if _listener is not None:
+        return
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "text")).lower()
+
+    stream_handler = logging.StreamHandler(stream or sys.stderr)
+    if fmt == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    queue_handler.setFormatter(_CappedFormatter())
+    queue_handler.addFilter(_TraceFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Write out queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, **fields):
+    """One structured record: `event key=value ...` in text, separate keys in JSON; values are size-capped"""
+    if not logger.isEnabledFor(level):
+        return
+    fields = {key: value if isinstance(value, (int, float, bool)) or value is None else truncate(value)
+              for key, value in fields.items()}
+    message = " ".join([event] + [f"{key}={value}" for key, value in fields.items()])
+    # LogRecord attribute names (module, filename, ...) cannot be passed in extra
+    extra = {f"{key}_" if key in _RESERVED else key: value for key, value in fields.items()}
+    logger.log(level, message, extra={"event": event, **extra})
+
+
+def payload_sampled(logger: logging.Logger) -> bool:
+    """Whether this request logs its payloads (prompt, context, response); decide once per request"""
+    return logger.isEnabledFor(logging.DEBUG) or (PAYLOAD_SAMPLE_RATE > 0 and random.random() < PAYLOAD_SAMPLE_RATE)
+
+
+def log_payload(logger: logging.Logger, event: str, sampled: bool, **payloads):
+    """Full payloads for sampled requests, each still capped at MAX_MESSAGE_CHARS"""
+    if not sampled:
+        return
+    for name, value in payloads.items():
+        logger.info(f"{event} {name}: {truncate(value, MAX_MESSAGE_CHARS)}", extra={"event": event, "payload": name})
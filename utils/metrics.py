@@ -0,0 +1,196 @@
+import time
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Minimal in-process metrics (counters, gauges, histograms with labels) rendered
+# in the Prometheus text exposition format by /metrics. An update takes one
+# lock and a dict lookup (a few microseconds), negligible next to the stages timed.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> list:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+    def render(self) -> str:
+        return "\n".join(self.header() + self.samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 function: Optional[Callable[[], Dict[tuple, float]]] = None):
+        super().__init__(name, documentation, labels)
+        # Evaluated at scrape time: returns {label values tuple: value}
+        self.function = function
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> list:
+        if self.function is None:
+            return super().samples()
+        values = self.function()
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in sorted(values.items()) if value is not None]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> list:
+        with self._lock:
+            values = {key: ([*state[0]], state[1], state[2]) for key, state in self._values.items()}
+        lines = []
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labels=()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labels)
+
+    def gauge(self, name: str, documentation: str, labels=(), function=None) -> Gauge:
+        gauge = self._get_or_create(Gauge, name, documentation, labels)
+        if function is not None:
+            gauge.function = function
+        return gauge
+
+    def histogram(self, name: str, documentation: str, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labels, buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+render = REGISTRY.render
+
+# Shared by the instrumented modules
+STAGE_SECONDS = histogram("edullm_stage_seconds", "Time spent per request stage", ["stage"])
+REQUEST_SECONDS = histogram("edullm_request_seconds", "End-to-end RAGChatbot request time", ["operation"])
+DB_SECONDS = histogram("edullm_db_seconds", "SQLite operation time", ["operation"])
+CACHE_REQUESTS = counter("edullm_cache_requests_total", "Cache lookups by cache and result (hit/miss)", ["cache", "result"])
+
+
+def _cache_hit_ratios() -> Dict[tuple, float]:
+    totals = {}
+    with CACHE_REQUESTS._lock:
+        values = dict(CACHE_REQUESTS._values)
+    for (cache, result), count in values.items():
+        hits, total = totals.get(cache, (0, 0))
+        totals[cache] = (hits + (count if result == "hit" else 0), total + count)
+    return {(cache,): hits / total for cache, (hits, total) in totals.items() if total}
+
+
+gauge("edullm_cache_hit_ratio", "Hits / lookups since start, per cache", ["cache"], function=_cache_hit_ratios)
+
+
+def timed(metric: Histogram, **labels):
+    """Decorator recording the duration of each call in `metric`"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with metric.time(**labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,70 @@
+import os
+import sys
+import json
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import PyPDF2
+
+logger = logging.getLogger(__name__)
+
+# Page ranges of large PDFs are extracted by worker processes running this module
+# (`python -m utils.pdf_extract FILE START END`, page texts as JSON on stdout).
+# Being their own __main__, workers import neither the parent's entry point (the
+# API and its chatbot) nor anything but PyPDF2, and no process state is shared.
+# Kept free of heavy imports for that reason.
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def extract_pages(file_path: str, start: int, end: int) -> List[str]:
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [pdf_reader.pages[i].extract_text() for i in range(start, end)]
+
+
+def _extract_in_worker(file_path: str, start: int, end: int) -> List[str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [PACKAGE_ROOT, env.get("PYTHONPATH")]))
+    result = subprocess.run(
+        [sys.executable, "-m", "utils.pdf_extract", file_path, str(start), str(end)],
+        capture_output=True, env=env
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"worker exited with code {result.returncode}: "
+                           f"{result.stderr.decode('utf-8', 'replace').strip()[-500:]}")
+    texts = json.loads(result.stdout)
+    if len(texts) != end - start:
+        raise RuntimeError(f"worker returned {len(texts)} pages instead of {end - start}")
+    return texts
+
+
+def read_pdf(file_path: str, workers: int = 1, min_pages: int = 40) -> str:
+    """Text of a PDF, page by page. From `min_pages` pages on, the pages are split
+    into `workers` ranges extracted by as many worker processes and reassembled in
+    page order, giving the same text as the sequential read."""
+    with open(file_path, 'rb') as file:
+        page_count = len(PyPDF2.PdfReader(file).pages)
+
+    if workers <= 1 or page_count < min_pages:
+        texts = extract_pages(file_path, 0, page_count)
+    else:
+        step = -(-page_count // workers)
+        ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+        try:
+            # Threads only wait on the worker processes
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                parts = list(executor.map(lambda r: _extract_in_worker(os.path.abspath(file_path), *r), ranges))
+            texts = [text for part in parts for text in part]
+            logger.info(f"Extracted {page_count} pages of {file_path} with {len(ranges)} processes")
+        except (OSError, RuntimeError, ValueError) as e:
+            logger.warning(f"PDF worker failed ({e}), extracting {file_path} sequentially")
+            texts = extract_pages(file_path, 0, page_count)
+    return "".join(text + "\n" for text in texts)
+
+
+if __name__ == "__main__":
+    path, first, last = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+    json.dump(extract_pages(path, first, last), sys.stdout)
@@ -0,0 +1,51 @@
+import time
+import logging
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RERANKER_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+
+class CrossEncoderReranker:
+    """Scores (query, chunk) pairs with a small multilingual cross-encoder on CPU.
+
+    Keeps a moving average of the cost per pair so callers can predict whether
+    re-ranking fits in their remaining latency budget before running it. The
+    average is seeded by a warm-up batch at construction, so the first request
+    is held to its budget too.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANKER_MODEL, max_length: int = 256, batch_size: int = 32,
+                 warm_up_pairs: int = 8):
+        from sentence_transformers import CrossEncoder
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+        self.seconds_per_pair = None
+        if warm_up_pairs:
+            self.warm_up(warm_up_pairs)
+
+    def warm_up(self, n_pairs: int = 8):
+        # The first predict call pays one-off initialisation; only the second one is timed
+        pairs = [("warm-up query", "warm-up document " * 40)] * n_pairs
+        self.model.predict(pairs[:1], batch_size=self.batch_size)
+        start = time.perf_counter()
+        self.model.predict(pairs, batch_size=self.batch_size)
+        self.seconds_per_pair = (time.perf_counter() - start) / n_pairs
+        logger.info(f"Re-ranker {self.model_name} warmed up: {self.seconds_per_pair * 1000:.1f} ms per pair")
+
+    def estimate_seconds(self, n_pairs: int) -> float:
+        if self.seconds_per_pair is None:
+            return 0.0
+        return self.seconds_per_pair * n_pairs
+
+    def score(self, query: str, documents: List[str]) -> List[float]:
+        """Score all documents in a single batched predict call (higher is more relevant)."""
+        if not documents:
+            return []
+        start = time.perf_counter()
+        scores = self.model.predict([(query, document) for document in documents], batch_size=self.batch_size)
+        per_pair = (time.perf_counter() - start) / len(documents)
+        self.seconds_per_pair = per_pair if self.seconds_per_pair is None else 0.8 * self.seconds_per_pair + 0.2 * per_pair
+        return [float(score) for score in scores]
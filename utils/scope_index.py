@@ -0,0 +1,132 @@
+import os
+import json
+import shutil
+import threading
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+from .vector_store import CompactVectorStore, SCOPE_FIELDS
+
+logger = logging.getLogger(__name__)
+
+
+class ScopeIndex:
+    """Exact in-process index partitioned by scope.
+
+    Each (departement, filiere, module, activite, profile, user) scope gets its
+    own directory holding a contiguous, normalized float32 matrix (memory-mapped
+    CompactVectorStore), so a scoped query is a single matrix-vector product
+    over that scope's chunks instead of a filtered HNSW search.
+    """
+
+    def __init__(self, root: str = "./scope_index"):
+        self.root = root
+        self._lock = threading.Lock()
+        self._stores = {}
+        os.makedirs(root, exist_ok=True)
+        self._documents_path = os.path.join(root, "documents.json")
+        if os.path.exists(self._documents_path):
+            with open(self._documents_path, "r", encoding="utf-8") as f:
+                self._documents = json.load(f)
+        else:
+            # file_hash -> {scope_key: chunk_count}
+            self._documents = {}
+
+    @staticmethod
+    def scope_key(scope: dict) -> str:
+        return "_".join(str(scope.get(field)) for field in SCOPE_FIELDS)
+
+    @staticmethod
+    def scope_from_where(where: dict) -> Optional[dict]:
+        """Extract a complete scope from a Chroma where clause, or None if it is partial."""
+        conditions = where.get("$and", [where]) if where else []
+        scope = {}
+        for condition in conditions:
+            scope.update(condition)
+        return scope if all(field in scope for field in SCOPE_FIELDS) else None
+
+    @property
+    def count(self) -> int:
+        return sum(sum(scopes.values()) for scopes in self._documents.values())
+
+    def _save_documents(self):
+        tmp = self._documents_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._documents, f)
+        os.replace(tmp, self._documents_path)
+
+    def _store(self, key: str, create: bool = False) -> Optional[CompactVectorStore]:
+        store = self._stores.get(key)
+        if store is None:
+            path = os.path.join(self.root, key)
+            if not create and not os.path.exists(path):
+                return None
+            store = CompactVectorStore(path, dtype="float32")
+            self._stores[key] = store
+        return store
+
+    def has_scope(self, scope: dict) -> bool:
+        return os.path.exists(os.path.join(self.root, self.scope_key(scope)))
+
+    def add(self, ids: List[str], embeddings, metadatas: List[dict]):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        groups = {}
+        for i, metadata in enumerate(metadatas):
+            groups.setdefault(self.scope_key(metadata), []).append(i)
+        with self._lock:
+            for key, rows in groups.items():
+                added = set(self._store(key, create=True).add([ids[i] for i in rows], vectors[rows], [metadatas[i] for i in rows]))
+                # Ids already in the store are skipped by it and must not be counted twice
+                for i in rows:
+                    if ids[i] not in added:
+                        continue
+                    scopes = self._documents.setdefault(metadatas[i]["file_hash"], {})
+                    scopes[key] = scopes.get(key, 0) + 1
+            self._save_documents()
+
+    def delete(self, file_hash: str) -> int:
+        with self._lock:
+            scopes = self._documents.pop(file_hash, {})
+            removed = 0
+            for key in scopes:
+                store = self._store(key)
+                if store is not None:
+                    removed += store.delete(file_hash=file_hash)
+            self._save_documents()
+            return removed
+
+    def query(self, query_embedding, n_results: int = 3, where: Optional[dict] = None) -> dict:
+        """Exact top-k within one scope; `where` must pin every scope field."""
+        scope = self.scope_from_where(where)
+        if scope is None:
+            raise ValueError("ScopeIndex queries require a complete scope filter")
+        with self._lock:
+            store = self._store(self.scope_key(scope))
+        if store is None:
+            return {"ids": [[]], "distances": [[]]}
+        return store.query(query_embedding, n_results=n_results)
+
+    def clear(self):
+        with self._lock:
+            self._stores = {}
+            self._documents = {}
+            shutil.rmtree(self.root, ignore_errors=True)
+            os.makedirs(self.root, exist_ok=True)
+
+    def sync_from_collection(self, collection, page_size: int = 1000) -> int:
+        """Rebuild every scope from the vectors held by a Chroma collection."""
+        self.clear()
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=["embeddings", "metadatas"])
+            if not page["ids"]:
+                break
+            vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.add(page["ids"], vectors / norms, page["metadatas"])
+            offset += len(page["ids"])
+        logger.info(f"Scope index {self.root} synced with {self.count} vectors")
+        return self.count
@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import queue
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Request traces: nested spans tracked with contextvars and exported, one trace
+# per line, as OTLP/JSON (the body of POST /v1/traces) to a local file or to a
+# collector.
+#   TRACE_SAMPLE_RATE    fraction of root spans recorded (default 0: off);
+#                        an incoming sampled W3C traceparent is always recorded
+#   TRACE_EXPORT_PATH    JSON lines file (default ./traces/spans.jsonl)
+#   TRACE_OTLP_ENDPOINT  collector URL instead, e.g. http://localhost:4318/v1/traces
+# Unsampled requests only pay for a contextvar lookup per span.
+
+SERVICE_NAME = "edullm"
+
+
+class Span:
+    __slots__ = ("name", "trace", "span_id", "parent_id", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace: "_Trace", parent_id: Optional[str], kind: int, attributes: dict):
+        self.name = name
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes)
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_exception(self, exception: BaseException):
+        self.error = f"{type(exception).__name__}: {exception}"
+
+    def to_otlp(self) -> dict:
+        return {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 0}
+        }
+
+
+class _NoopSpan:
+    def set_attribute(self, key: str, value):
+        pass
+
+    def record_exception(self, exception: BaseException):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Trace:
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self.lock:
+            self.spans.append(span)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Exporter:
+    """Writes finished traces from a background thread so requests never wait on I/O"""
+
+    def __init__(self, path: Optional[str] = None, endpoint: Optional[str] = None):
+        self.path = path or os.getenv("TRACE_EXPORT_PATH", "./traces/spans.jsonl")
+        self.endpoint = endpoint or os.getenv("TRACE_OTLP_ENDPOINT")
+        self.queue = queue.Queue(maxsize=1000)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, trace: _Trace):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+        try:
+            self.queue.put_nowait(trace)
+        except queue.Full:
+            logger.warning("Trace export queue is full, dropping a trace")
+
+    def _payload(self, trace: _Trace) -> dict:
+        with trace.lock:
+            spans = [span.to_otlp() for span in trace.spans]
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": spans}]
+        }]}
+
+    def _run(self):
+        while True:
+            payload = self._payload(self.queue.get())
+            try:
+                if self.endpoint:
+                    import requests
+                    requests.post(self.endpoint, json=payload, timeout=5)
+                else:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+            except Exception as e:
+                logger.warning(f"Error exporting trace: {e}")
+
+
+_current = contextvars.ContextVar("edullm_span", default=None)
+sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+exporter = Exporter()
+
+
+def parse_traceparent(header: Optional[str]):
+    """(trace_id, parent span id, sampled) from a W3C traceparent header, or None"""
+    try:
+        version, trace_id, parent_id, flags = header.strip().split("-")
+        if len(trace_id) != 32 or len(parent_id) != 16 or int(trace_id, 16) == 0:
+            return None
+        return trace_id, parent_id, bool(int(flags, 16) & 1)
+    except (AttributeError, ValueError):
+        return None
+
+
+def current_traceparent() -> Optional[str]:
+    """traceparent header for outgoing calls made inside the current span"""
+    span = _current.get()
+    if not isinstance(span, Span):
+        return None
+    return f"00-{span.trace.trace_id}-{span.span_id}-01"
+
+
+@contextmanager
+def span(name: str, traceparent: Optional[str] = None, server: bool = False, **attributes):
+    """Record a span around the block; the first span of a context starts (and samples) a trace"""
+    parent = _current.get()
+    if parent is NOOP_SPAN:
+        yield NOOP_SPAN
+        return
+    if parent is None:
+        remote = parse_traceparent(traceparent)
+        sampled = remote[2] if remote and remote[2] else random.random() < sample_rate
+        if not sampled:
+            token = _current.set(NOOP_SPAN)
+            try:
+                yield NOOP_SPAN
+            finally:
+                _current.reset(token)
+            return
+        trace = _Trace(remote[0] if remote else os.urandom(16).hex())
+        parent_id = remote[1] if remote else None
+    else:
+        trace, parent_id = parent.trace, parent.span_id
+
+    current = Span(name, trace, parent_id, 2 if server else 1, attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_exception(e)
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current.reset(token)
+        trace.add(current)
+        if parent is None:
+            exporter.submit(trace)
+
+
+def traced(name: str):
+    """Decorator recording each call as a span"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
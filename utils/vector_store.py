@@ -0,0 +1,244 @@
+import os
+import json
+import threading
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SCOPE_FIELDS = ("departement_id", "filiere_id", "module_id", "activite_id", "profile_id", "user_id")
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+class CompactVectorStore:
+    """Memory-mapped vector store keeping embeddings as float32, float16 or int8.
+
+    Compact vectors are scanned for a coarse top-k, then the best
+    `rerank_factor * n_results` candidates are re-scored against a float32
+    copy kept on disk (only those rows are paged in). int8 uses per-vector
+    scalar quantization: q = round(v / max|v| * 127).
+
+    Distances are squared L2 between unit vectors (2 - 2 * cosine), i.e. the
+    same values Chroma returns for its default "l2" space, so existing
+    similarity thresholds keep their meaning.
+    """
+
+    def __init__(self, path: str, dtype: str = "float16", rerank_factor: int = 4, block_size: int = 65536):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported dtype: {dtype}")
+        self.path = path
+        self.dtype = dtype
+        self.rerank_factor = rerank_factor
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        info_path = self._file("store.json")
+        if os.path.exists(info_path):
+            with open(info_path, "r", encoding="utf-8") as f:
+                info = json.load(f)
+            if info["dtype"] != self.dtype:
+                raise ValueError(f"Store at {self.path} uses {info['dtype']}, not {self.dtype}")
+            self.dim = info["dim"]
+            self.ids = info["ids"]
+        else:
+            self.dim = None
+            self.ids = []
+        self._id_set = set(self.ids)
+        self._open_arrays()
+
+    def _memmap(self, name, dtype, shape):
+        if not shape[0] or not os.path.exists(self._file(name)):
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode="r", shape=shape)
+
+    def _open_arrays(self):
+        n, d = len(self.ids), self.dim or 0
+        self.compact = self._memmap("vectors.bin", DTYPES[self.dtype], (n, d))
+        self.scales = self._memmap("scales.f32", np.float32, (n,))
+        # float32 stores are already exact: no separate re-ranking copy
+        self.full = self.compact if self.dtype == "float32" else self._memmap("full.f32", np.float32, (n, d))
+        self.scopes = self._memmap("scopes.i64", np.int64, (n, len(SCOPE_FIELDS)))
+
+    def _save_info(self):
+        tmp = self._file("store.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dtype": self.dtype, "dim": self.dim, "ids": self.ids}, f)
+        os.replace(tmp, self._file("store.json"))
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+    def _encode(self, vectors: np.ndarray):
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1)
+            scales[scales == 0] = 1.0
+            compact = np.round(vectors / scales[:, None] * 127).astype(np.int8)
+            return compact, scales.astype(np.float32)
+        return vectors.astype(DTYPES[self.dtype]), np.ones(len(vectors), dtype=np.float32)
+
+    @staticmethod
+    def _scope_row(metadata: dict):
+        return [metadata.get(field) if metadata.get(field) is not None else -1 for field in SCOPE_FIELDS]
+
+    def add(self, ids: List[str], embeddings, metadatas: List[dict]) -> List[str]:
+        """Append rows; ids already stored are skipped. Returns the ids actually added."""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if not len(vectors):
+            return []
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            keep = [i for i, id_ in enumerate(ids) if id_ not in self._id_set]
+            if not keep:
+                return []
+            vectors = vectors[keep]
+            compact, scales = self._encode(vectors)
+            scopes = np.asarray([self._scope_row(metadatas[i]) for i in keep], dtype=np.int64)
+
+            self._close_arrays()
+            with open(self._file("vectors.bin"), "ab") as f:
+                f.write(compact.tobytes())
+            with open(self._file("scales.f32"), "ab") as f:
+                f.write(scales.tobytes())
+            if self.dtype != "float32":
+                with open(self._file("full.f32"), "ab") as f:
+                    f.write(vectors.tobytes())
+            with open(self._file("scopes.i64"), "ab") as f:
+                f.write(scopes.tobytes())
+
+            new_ids = [ids[i] for i in keep]
+            self.ids.extend(new_ids)
+            self._id_set.update(new_ids)
+            self._save_info()
+            self._open_arrays()
+            return new_ids
+
+    def _close_arrays(self):
+        self.compact = self.scales = self.full = self.scopes = None
+
+    def delete(self, ids: Optional[List[str]] = None, file_hash: Optional[str] = None) -> int:
+        """Delete rows by id, or every chunk of a document (ids are '{file_hash}_{i}')."""
+        with self._lock:
+            if ids is not None:
+                targets = set(ids)
+                drop = np.array([id_ in targets for id_ in self.ids], dtype=bool)
+            elif file_hash is not None:
+                prefix = f"{file_hash}_"
+                drop = np.array([id_.startswith(prefix) for id_ in self.ids], dtype=bool)
+            else:
+                return 0
+            removed = int(drop.sum()) if len(drop) else 0
+            if removed:
+                self._rewrite(~drop)
+            return removed
+
+    def _rewrite(self, keep: np.ndarray):
+        arrays = {
+            "vectors.bin": np.array(self.compact[keep]),
+            "scales.f32": np.array(self.scales[keep]),
+            "scopes.i64": np.array(self.scopes[keep]),
+        }
+        if self.dtype != "float32":
+            arrays["full.f32"] = np.array(self.full[keep])
+        self._close_arrays()
+        for name, array in arrays.items():
+            tmp = self._file(name + ".tmp")
+            with open(tmp, "wb") as f:
+                f.write(array.tobytes())
+            os.replace(tmp, self._file(name))
+        self.ids = [id_ for id_, k in zip(self.ids, keep) if k]
+        self._id_set = set(self.ids)
+        self._save_info()
+        self._open_arrays()
+
+    def clear(self):
+        with self._lock:
+            self._close_arrays()
+            for name in ("vectors.bin", "scales.f32", "full.f32", "scopes.i64", "store.json"):
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+            self.dim, self.ids, self._id_set = None, [], set()
+            self._open_arrays()
+
+    def _candidate_rows(self, where: Optional[dict]):
+        if not where:
+            return None
+        conditions = where.get("$and", [where])
+        mask = np.ones(self.count, dtype=bool)
+        for condition in conditions:
+            for field, value in condition.items():
+                if field not in SCOPE_FIELDS:
+                    raise ValueError(f"Unsupported filter field: {field}")
+                column = SCOPE_FIELDS.index(field)
+                mask &= self.scopes[:, column] == (value if value is not None else -1)
+        return np.nonzero(mask)[0]
+
+    def _coarse_scores(self, query: np.ndarray, rows):
+        if rows is not None:
+            compact = self.compact[rows].astype(np.float32)
+            return (compact @ query) * (self.scales[rows] / 127 if self.dtype == "int8" else 1)
+        scores = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, self.block_size):
+            stop = min(start + self.block_size, self.count)
+            block = self.compact[start:stop].astype(np.float32, copy=False) @ query
+            if self.dtype == "int8":
+                block *= self.scales[start:stop] / 127
+            scores[start:stop] = block
+        return scores
+
+    def query(self, query_embedding, n_results: int = 3, where: Optional[dict] = None) -> dict:
+        """Chroma-like query returning {"ids": [[...]], "distances": [[...]]}."""
+        with self._lock:
+            empty = {"ids": [[]], "distances": [[]]}
+            if not self.count:
+                return empty
+            query = np.asarray(query_embedding, dtype=np.float32)
+            rows = self._candidate_rows(where)
+            if rows is not None and not len(rows):
+                return empty
+
+            scores = self._coarse_scores(query, rows)
+            positions = np.arange(len(scores)) if rows is None else rows
+
+            n_candidates = len(scores) if self.dtype == "float32" else min(len(scores), n_results * self.rerank_factor)
+            n_candidates = max(n_candidates, min(n_results, len(scores)))
+            top = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+            candidates = positions[top]
+
+            if self.dtype != "float32":
+                order = np.argsort(candidates)  # sequential reads on the float32 file
+                candidates = candidates[order]
+                exact = np.asarray(self.full[candidates]) @ query
+            else:
+                exact = scores[top]
+
+            best = np.argsort(-exact)[:n_results]
+            return {
+                "ids": [[self.ids[candidates[i]] for i in best]],
+                "distances": [[float(2 - 2 * exact[i]) for i in best]]
+            }
+
+    def sync_from_collection(self, collection, page_size: int = 1000) -> int:
+        """Rebuild the store from the vectors already held by a Chroma collection."""
+        self.clear()
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=["embeddings", "metadatas"])
+            if not page["ids"]:
+                break
+            vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.add(page["ids"], vectors / norms, page["metadatas"])
+            offset += len(page["ids"])
+        logger.info(f"Vector store {self.path} synced with {self.count} vectors")
+        return self.count
@@ -0,0 +1,33 @@
+import argparse
+import json
+import sys
+
+import chromadb
+
+from utils.embedding_backend import get_embedding_backend, check_backend_recall
+from utils.filter_manager import FilterManager
+
+# Checks that an alternative embedding backend (ONNX / int8) retrieves the same
+# neighbours as the fp32 vectors already stored in Chroma, before switching
+# EMBEDDING_BACKEND in production.
+
+parser = argparse.ArgumentParser(description="Validate an embedding backend against the existing Chroma store")
+parser.add_argument("--backend", default="onnx-int8", help="sentence-transformers, onnx or onnx-int8")
+parser.add_argument("--db-path", default="./chroma_db")
+parser.add_argument("--collection", default="documents")
+parser.add_argument("--sqlite-path", default="./bdd/chatbot_metadata.db", help="Chunk texts for the single storage mode")
+parser.add_argument("--sample", type=int, default=200, help="Number of stored chunks to re-encode")
+parser.add_argument("--top-k", type=int, default=10)
+parser.add_argument("--min-recall", type=float, default=0.9)
+args = parser.parse_args()
+
+client = chromadb.PersistentClient(path=args.db_path)
+collection = client.get_collection(name=args.collection)
+backend = get_embedding_backend(args.backend)
+
+report = check_backend_recall(backend, collection, sample_size=args.sample, top_k=args.top_k,
+                              text_loader=FilterManager(args.sqlite_path).get_chunk_texts)
+print(json.dumps(report, indent=2))
+
+if report["status"] != "success" or report["recall_at_k"] < args.min_recall:
+    sys.exit(1)
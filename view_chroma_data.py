@@ -1,4 +1,6 @@
 from chromadb import PersistentClient
+from utils.exporter import iter_chroma_documents
+from utils.filter_manager import FilterManager
 
 # Path to your ChromaDB folder
 client = PersistentClient(path="./chroma_db")
@@ -13,15 +15,10 @@ for col in collections:
 collection_name = "documents"
 collection = client.get_collection(name=collection_name)
 
-# Fetch all data
-data = collection.get()
-
-# Print the documents
+# Fetch data page by page (a single collection.get() loads the whole collection in memory)
 print("\n--- DOCUMENTS ---")
-for doc_id, doc in zip(data["ids"], data["documents"]):
+for row in iter_chroma_documents(collection, text_loader=FilterManager("./bdd/chatbot_metadata.db").get_chunk_texts):
+    doc_id = row.pop("id")
+    doc = row.pop("document")
     print(f"{doc_id}: {doc}")
-
-# Print metadata
-print("\n--- METADATA ---")
-for meta in data.get("metadatas", []):
-    print(meta)
+    print(row)
@@ -0,0 +1,51 @@
+import argparse
+
+from rag_chatbot import RAGChatbot
+from utils.folder_watcher import FolderWatcher
+from utils.log_config import configure_logging
+
+# Keeps the index in sync with a directory tree: new and changed files are
+# ingested in batches, removed files are deleted. Scopes come from numeric
+# directories (<departement>/<filiere>/<module>/<activite>/), scope.json files
+# or <file>.meta.json sidecars (see utils/folder_watcher.py), e.g.:
+#   python watch_folder.py ./uploads/courses --profile-id 2 --user-id 5
+#   python watch_folder.py ./uploads/courses --once
+
+
+def main():
+    configure_logging()
+
+    parser = argparse.ArgumentParser(description="Watch a folder and ingest new, changed and removed files")
+    parser.add_argument("root")
+    parser.add_argument("--state-path", default="./bdd/watch_state.json")
+    parser.add_argument("--interval", type=float, default=30.0, help="Seconds between scans")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--settle-seconds", type=float, default=2.0, help="Skip files modified more recently than this")
+    parser.add_argument("--once", action="store_true", help="Run a single scan and exit")
+    for field in ("departement-id", "filiere-id", "module-id", "activite-id", "profile-id", "user-id"):
+        parser.add_argument(f"--{field}", type=int, help="Default scope id when not given by the path or a scope file")
+    args = parser.parse_args()
+
+    # Ingestion does not call the LLM
+    chatbot = RAGChatbot(ollama_api=None)
+    watcher = FolderWatcher(
+        chatbot, args.root, state_path=args.state_path, batch_size=args.batch_size, settle_seconds=args.settle_seconds,
+        defaults={
+            "departement_id": args.departement_id,
+            "filiere_id": args.filiere_id,
+            "module_id": args.module_id,
+            "activite_id": args.activite_id,
+            "profile_id": args.profile_id,
+            "user_id": args.user_id
+        }
+    )
+
+    if args.once:
+        print(watcher.scan())
+    else:
+        watcher.run(args.interval)
+
+
+# Guarded: PDF extraction workers are spawned and re-import the __main__ module
+if __name__ == "__main__":
+    main()